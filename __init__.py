@@ -9,6 +9,7 @@ else:
     from .nodes.lora_switcher_20 import LoRASwitcherNode20
     from .nodes.lora_switcher_40 import LoRASwitcherNode40
     from .nodes.lora_switcher_dynamic import LoraSwitcherDynamic
+    from .nodes.lora_switcher_sweep import LoraSwitcherSweep
     # Other node imports
     from .nodes.llm_aio import LLMAIONode
     from .nodes.string_splitter import StringSplitterNode
@@ -23,6 +24,7 @@ else:
         "LoRASwitcherNode40": LoRASwitcherNode40,
         # New LoRA switcher
         "LoraSwitcherDynamic": LoraSwitcherDynamic,
+        "LoraSwitcherSweep": LoraSwitcherSweep,
         # Other nodes
         "LLMAIONode": LLMAIONode,
         "StringSplitterNode": StringSplitterNode,
@@ -38,6 +40,7 @@ else:
         "LoRASwitcherNode40": LoRASwitcherNode40.TITLE,
         # New LoRA switcher
         "LoraSwitcherDynamic": LoraSwitcherDynamic.TITLE,
+        "LoraSwitcherSweep": LoraSwitcherSweep.TITLE,
         # Other nodes
         "LLMAIONode": LLMAIONode.TITLE,
         "StringSplitterNode": StringSplitterNode.TITLE,
@@ -0,0 +1,97 @@
+"""
+Per-request latency of one-off requests.post calls (what the API nodes used to
+do) versus the pooled keep-alive client in nodes/http_transport.py.
+
+Runs against a local HTTPS stand-in server with a throwaway self-signed
+certificate (needs the openssl CLI), which answers like a chat API with a
+gzip-encoded JSON body. Run from the ComfyUI root or any environment with the
+node requirements installed:
+
+    python custom_nodes/ComfyUI-oshtz-nodes/benchmarks/http_transport_bench.py
+"""
+import gzip
+import json
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+# Import the node modules without running the package __init__ (which needs a live PromptServer)
+_package = types.ModuleType("oshtz_nodes")
+_package.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")]
+sys.modules["oshtz_nodes"] = _package
+from oshtz_nodes.nodes.http_transport import HttpTransport
+
+REQUESTS = 50
+RESPONSE = gzip.compress(json.dumps({"choices": [{"message": {"content": "ok " * 2000}}]}).encode())
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers and body are separate writes
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(tmp):
+    cert, key = os.path.join(tmp, "cert.pem"), os.path.join(tmp, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+         "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, cert
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        server, cert = start_server(tmp)
+        url = f"https://localhost:{server.server_address[1]}/v1/chat/completions"
+        body = {"model": "stand-in", "messages": [{"role": "user", "content": "hi"}]}
+
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            plain = requests.post(url, json=body, verify=cert, timeout=30).json()
+        plain_ms = (time.perf_counter() - start) * 1000 / REQUESTS
+
+        transport = HttpTransport(pool_connections=4, pool_maxsize=4, connect_timeout=10)
+        start = time.perf_counter()
+        for _ in range(REQUESTS):
+            response = transport.post(url, json=body, verify=cert, timeout=30)
+        pooled_ms = (time.perf_counter() - start) * 1000 / REQUESTS
+        server.shutdown()
+
+    assert response.json() == plain, "pooled client decoded a different body"
+    stats = transport.stats()
+    print(f"requests.post: {plain_ms:7.2f} ms/request (new TLS connection each time)")
+    print(f"pooled:        {pooled_ms:7.2f} ms/request ({stats['new_connections']} connection(s) for {stats['requests']} requests)")
+    print(f"pooled timings: connect {stats['avg_connect_ms']:.2f} ms, ttfb {stats['avg_ttfb_ms']:.2f} ms, "
+          f"transfer {stats['avg_transfer_ms']:.2f} ms (avg); last response {response.timing['wire_bytes']} B on the wire, "
+          f"{response.timing['bytes']} B decoded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Time to first token with and without SSE streaming in the LLM All-In-One
+node, for both the OpenAI and the Anthropic wire formats.
+
+Runs against a local stand-in server that "generates" one token every few
+milliseconds and answers either with a complete JSON body or with a
+server-sent event stream, and checks that the streamed response is rebuilt
+into exactly the text a non-streamed call returns. Run from the ComfyUI root
+or any environment with the node requirements installed:
+
+    python custom_nodes/ComfyUI-oshtz-nodes/benchmarks/llm_stream_bench.py
+"""
+import json
+import os
+import sys
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Import the node modules without running the package __init__ (which needs a live PromptServer)
+_package = types.ModuleType("oshtz_nodes")
+_package.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")]
+sys.modules["oshtz_nodes"] = _package
+from oshtz_nodes.nodes.llm_aio import ClaudeApi, LLMConfig, LLMMessage, LLMMessageRole, OpenAIApi
+from oshtz_nodes.nodes.llm_stream import stream_stats
+
+TOKENS = [f"word{i} " for i in range(80)]
+TOKEN_SECONDS = 0.01
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        anthropic = self.path.endswith("/messages")
+        time.sleep(0.05)  # prompt processing before the first token
+        if not body.get("stream"):
+            for _ in TOKENS:
+                time.sleep(TOKEN_SECONDS)
+            text = "".join(TOKENS)
+            if anthropic:
+                reply = {"content": [{"type": "text", "text": text}], "usage": {"output_tokens": len(TOKENS)}}
+            else:
+                reply = {"choices": [{"message": {"content": text}}], "usage": {"completion_tokens": len(TOKENS)}}
+            payload = json.dumps(reply).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        if anthropic:
+            self.event("message_start", {"type": "message_start", "message": {"usage": {"input_tokens": 5}}})
+        for token in TOKENS:
+            time.sleep(TOKEN_SECONDS)
+            if anthropic:
+                self.event("content_block_delta", {"type": "content_block_delta", "delta": {"type": "text_delta", "text": token}})
+            else:
+                self.event(None, {"choices": [{"delta": {"content": token}}]})
+        if anthropic:
+            self.event("message_delta", {"type": "message_delta", "usage": {"output_tokens": len(TOKENS)}})
+            self.event("message_stop", {"type": "message_stop"})
+        else:
+            self.event(None, {"choices": [], "usage": {"completion_tokens": len(TOKENS)}})
+            self.chunk(b"data: [DONE]\n\n")
+        self.chunk(b"")
+
+    def event(self, name, data):
+        prefix = f"event: {name}\n".encode() if name else b""
+        self.chunk(prefix + b"data: " + json.dumps(data).encode() + b"\n\n")
+
+    def chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    messages = [LLMMessage.create(role=LLMMessageRole.user, text="Enhance this prompt")]
+
+    for name, api, model in [
+        ("openai", OpenAIApi(api_key="stand-in", endpoint=endpoint), "gpt-4o"),
+        ("anthropic", ClaudeApi(api_key="stand-in", endpoint=endpoint), "claude-3-haiku-20240307"),
+    ]:
+        config = LLMConfig(model=model, max_token=256, temperature=0)
+        start = time.perf_counter()
+        plain = api.chat(messages, config, seed=1)
+        plain_ms = (time.perf_counter() - start) * 1000
+        streamed = api.chat(messages, config, seed=1, stream=True)
+        assert streamed == plain, f"{name}: streamed text differs from the non-streamed response"
+        timing = stream_stats()["recent"][-1]
+        print(f"{name:9}  non-streamed: first text after {plain_ms:6.0f} ms | streamed: first token after "
+              f"{timing['ttft_ms']:6.0f} ms, {timing['tokens']} tokens at {timing['tokens_per_second']:.0f} tokens/s")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
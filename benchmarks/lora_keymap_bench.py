@@ -0,0 +1,99 @@
+"""
+Per-switch CPU time of LoRA key mapping, uncached (what LoraLoader does on
+every run) versus served from nodes/lora_keymap.py.
+
+Uses an SDXL-sized synthetic UNet key set, so no checkpoint is needed.
+Run from the ComfyUI root so the comfy package is importable:
+
+    python custom_nodes/ComfyUI-oshtz-nodes/benchmarks/lora_keymap_bench.py
+"""
+import os
+import sys
+import time
+import types
+
+import torch
+
+sys.path.insert(0, os.getcwd())
+import comfy.lora
+import comfy.utils
+
+# Import the node modules without running the package __init__ (which needs a live PromptServer)
+_package = types.ModuleType("oshtz_nodes")
+_package.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")]
+sys.modules["oshtz_nodes"] = _package
+from oshtz_nodes.nodes.lora_keymap import LoraKeyMapCache
+
+SDXL_UNET_CONFIG = {
+    "model_channels": 320,
+    "in_channels": 4,
+    "out_channels": 4,
+    "num_res_blocks": [2, 2, 2],
+    "channel_mult": [1, 2, 4],
+    "transformer_depth": [0, 0, 2, 2, 10, 10],
+    "transformer_depth_output": [0, 0, 0, 2, 2, 2, 10, 10, 10],
+    "transformer_depth_middle": 10,
+    "context_dim": 2048,
+    "num_head_channels": 64,
+    "use_linear_in_transformer": True,
+    "adm_in_channels": 2816,
+}
+RANK = 16
+SWITCHES = 50
+
+
+class SyntheticUNet:
+    """Stands in for BaseModel: SDXL key names, meta tensors, no weights."""
+
+    def __init__(self):
+        self.model_config = types.SimpleNamespace(unet_config=SDXL_UNET_CONFIG)
+        self.diffusers_keys = comfy.utils.unet_to_diffusers(SDXL_UNET_CONFIG)
+        self._sd = {f"diffusion_model.{k}": torch.empty(1, device="meta") for k in self.diffusers_keys.values()}
+
+    def state_dict(self, *args, **kwargs):
+        return dict(self._sd)
+
+
+def synthetic_lora(unet, seed):
+    generator = torch.Generator().manual_seed(seed)
+    lora = {}
+    for diffusers_key in unet.diffusers_keys:
+        if "attn" not in diffusers_key or not diffusers_key.endswith(".weight"):
+            continue
+        prefix = "lora_unet_" + diffusers_key[:-len(".weight")].replace(".", "_")
+        lora[f"{prefix}.lora_down.weight"] = torch.randn(RANK, 8, generator=generator)
+        lora[f"{prefix}.lora_up.weight"] = torch.randn(8, RANK, generator=generator)
+        lora[f"{prefix}.alpha"] = torch.tensor(float(RANK))
+    return lora
+
+
+def uncached_switch(unet, lora):
+    key_map = comfy.lora.model_lora_keys_unet(unet, {})
+    return comfy.lora.load_lora(lora, key_map)
+
+
+def main():
+    unet = SyntheticUNet()
+    model = types.SimpleNamespace(model=unet)
+    loras = [synthetic_lora(unet, seed) for seed in range(3)]
+    cache = LoraKeyMapCache(64)
+    print(f"UNet weights: {len(unet._sd)}, LoRA tensors per file: {len(loras[0])}")
+
+    start = time.process_time()
+    for i in range(SWITCHES):
+        before = uncached_switch(unet, loras[i % len(loras)])
+    uncached_ms = (time.process_time() - start) * 1000 / SWITCHES
+
+    cache.resolve_patches(model, None, loras[0])  # warm-up: one-time key map and match
+    start = time.process_time()
+    for i in range(SWITCHES):
+        after = cache.resolve_patches(model, None, loras[i % len(loras)])
+    cached_ms = (time.process_time() - start) * 1000 / SWITCHES
+
+    assert before.keys() == after.keys(), "cached key mapping resolved different weights"
+    print(f"uncached: {uncached_ms:.2f} ms/switch")
+    print(f"cached:   {cached_ms:.2f} ms/switch ({uncached_ms / max(cached_ms, 1e-9):.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+CPU cost of switching a LoRA merged into the weights (what ModelPatcher does on
+load) versus applied unmerged through the low-rank hooks of nodes/lora_lowrank.py,
+plus the per-step forward overhead each mode adds.
+
+Uses a small synthetic conv/attention UNet, so no checkpoint is needed.
+Run from the ComfyUI root so the comfy package is importable:
+
+    python custom_nodes/ComfyUI-oshtz-nodes/benchmarks/lora_lowrank_bench.py
+"""
+import os
+import sys
+import time
+import types
+
+import torch
+
+sys.path.insert(0, os.getcwd())
+
+# Import the node modules without running the package __init__ (which needs a live PromptServer)
+_package = types.ModuleType("oshtz_nodes")
+_package.__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")]
+sys.modules["oshtz_nodes"] = _package
+from oshtz_nodes.nodes.lora_lowrank import LowRankLayer, LowRankLora
+
+CHANNELS = 320
+BLOCKS = 6
+RANK = 16
+SWITCHES = 20
+STEPS = 10
+
+
+class Block(torch.nn.Module):
+    def __init__(self, channels):
+        super().__init__()
+        self.conv = torch.nn.Conv2d(channels, channels, 3, padding=1)
+        self.to_q = torch.nn.Linear(channels, channels)
+        self.to_k = torch.nn.Linear(channels, channels)
+        self.to_v = torch.nn.Linear(channels, channels)
+        self.proj = torch.nn.Linear(channels, channels)
+
+    def forward(self, x):
+        x = x + self.conv(x)
+        b, c, h, w = x.shape
+        tokens = x.flatten(2).transpose(1, 2)
+        attn = torch.nn.functional.scaled_dot_product_attention(self.to_q(tokens), self.to_k(tokens), self.to_v(tokens))
+        return x + self.proj(attn).transpose(1, 2).reshape(b, c, h, w)
+
+
+class SyntheticUNet(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.blocks = torch.nn.ModuleList(Block(CHANNELS) for _ in range(BLOCKS))
+
+    def forward(self, x):
+        for block in self.blocks:
+            x = block(x)
+        return x
+
+
+class Executor:
+    """Minimal stand-in for comfy.patcher_extension.WrapperExecutor: class_obj is the diffusion model."""
+
+    def __init__(self, module):
+        self.class_obj = module
+
+    def __call__(self, *args, **kwargs):
+        return self.class_obj(*args, **kwargs)
+
+
+def synthetic_lora(unet, seed):
+    """module path -> (up, down) shaped like a kohya LoRA for that layer."""
+    generator = torch.Generator().manual_seed(seed)
+    lora = {}
+    for path, module in unet.named_modules():
+        if isinstance(module, torch.nn.Linear):
+            down = torch.randn(RANK, module.in_features, generator=generator) * 0.01
+            up = torch.randn(module.out_features, RANK, generator=generator) * 0.01
+        elif isinstance(module, torch.nn.Conv2d):
+            down = torch.randn(RANK, module.in_channels, *module.kernel_size, generator=generator) * 0.01
+            up = torch.randn(module.out_channels, RANK, 1, 1, generator=generator) * 0.01
+        else:
+            continue
+        lora[path] = (up, down)
+    return lora
+
+
+def merged_switch(unet, backup, lora, strength):
+    """Restore the base weights and merge the next LoRA, as ModelPatcher.patch_model does."""
+    with torch.no_grad():
+        for path, (up, down) in lora.items():
+            weight = unet.get_submodule(path).weight
+            weight.copy_(backup[path])
+            delta = torch.mm(up.flatten(start_dim=1), down.flatten(start_dim=1)).reshape(weight.shape)
+            weight.add_(delta, alpha=strength)
+
+
+def low_rank_switch(lora, strength):
+    return LowRankLora({path: LowRankLayer(up, down, 1.0) for path, (up, down) in lora.items()}, strength)
+
+
+def timed_steps(run, x):
+    start = time.perf_counter()
+    for _ in range(STEPS):
+        out = run(x)
+    return out, (time.perf_counter() - start) * 1000 / STEPS
+
+
+def main():
+    torch.manual_seed(0)
+    unet = SyntheticUNet().eval()
+    backup = {path: module.weight.detach().clone() for path, module in unet.named_modules() if hasattr(module, "weight")}
+    loras = [synthetic_lora(unet, seed) for seed in range(3)]
+    x = torch.randn(1, CHANNELS, 32, 32)
+    print(f"UNet: {BLOCKS} blocks, {sum(p.numel() for p in unet.parameters()) / 1e6:.1f}M params, rank {RANK}")
+
+    start = time.perf_counter()
+    for i in range(SWITCHES):
+        merged_switch(unet, backup, loras[i % len(loras)], 0.8)
+    merged_switch_ms = (time.perf_counter() - start) * 1000 / SWITCHES
+
+    start = time.perf_counter()
+    for i in range(SWITCHES):
+        wrapper = low_rank_switch(loras[i % len(loras)], 0.8)
+    low_rank_switch_ms = (time.perf_counter() - start) * 1000 / SWITCHES
+
+    with torch.no_grad():
+        merged_switch(unet, backup, loras[(SWITCHES - 1) % len(loras)], 0.8)
+        merged_out, merged_step_ms = timed_steps(unet, x)
+
+        for path, weight in backup.items():
+            unet.get_submodule(path).weight.copy_(weight)
+        _, base_step_ms = timed_steps(unet, x)
+
+        # Base weights stay untouched; the wrapper adds the LoRA around each call
+        low_rank_out, low_rank_step_ms = timed_steps(lambda inp: wrapper(Executor(unet), inp), x)
+
+    error = (merged_out - low_rank_out).abs().max().item()
+    print(f"max |merged - low_rank| output difference: {error:.2e}")
+    print(f"switch   merged: {merged_switch_ms:8.2f} ms   low_rank: {low_rank_switch_ms:8.3f} ms")
+    print(f"step     base:   {base_step_ms:8.2f} ms   merged: {merged_step_ms:8.2f} ms   low_rank: {low_rank_step_ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+import collections
+import email.utils
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from ..utils import env_int
+from .async_transport import POLL_SECONDS, processing_interrupted, raise_if_interrupted, request_not_sent, api_transport
+from .disk_cache import content_key
+
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_MAX_IN_FLIGHT = 8
+DEFAULT_QUEUE_SIZE = 64
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+# 529 is Anthropic's "overloaded"
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+# POSTs are only resent when the provider turned them away unprocessed: 429 rate limit, 503 unavailable,
+# 529 overloaded. 408, 409, 500, 502 and 504 can arrive after the request was already run (and billed).
+POST_RETRY_STATUSES = {429, 503, 529}
+
+# Rate-limit headers per provider: (limit, remaining, reset) for requests and for tokens
+RATE_LIMIT_HEADERS = {
+    "openai": [
+        ("x-ratelimit-limit-requests", "x-ratelimit-remaining-requests", "x-ratelimit-reset-requests"),
+        ("x-ratelimit-limit-tokens", "x-ratelimit-remaining-tokens", "x-ratelimit-reset-tokens"),
+    ],
+    "anthropic": [
+        ("anthropic-ratelimit-requests-limit", "anthropic-ratelimit-requests-remaining", "anthropic-ratelimit-requests-reset"),
+        ("anthropic-ratelimit-tokens-limit", "anthropic-ratelimit-tokens-remaining", "anthropic-ratelimit-tokens-reset"),
+    ],
+}
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset(value):
+    """Seconds until a rate-limit window resets, from "6m0s"/"20ms" durations, plain seconds or an RFC 3339 time."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = _DURATION.findall(value)
+    if parts and "".join(number + unit for number, unit in parts) == value:
+        return sum(float(number) * _UNIT_SECONDS[unit] for number, unit in parts)
+    try:
+        reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return max(0.0, (reset_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def parse_retry_after(headers):
+    """
+    Delay requested by Retry-After (seconds or an HTTP date) or retry-after-ms,
+    capped at BACKOFF_MAX_SECONDS, or None.
+    """
+    seconds = _retry_after_seconds(headers)
+    return min(seconds, BACKOFF_MAX_SECONDS) if seconds is not None else None
+
+
+def _retry_after_seconds(headers):
+    milliseconds = headers.get("retry-after-ms")
+    if milliseconds:
+        try:
+            return max(0.0, float(milliseconds) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def _header_number(headers, name):
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Requests-per-minute bucket. It starts unthrottled (or at OSHTZ_API_RPM)
+    and is resized from the provider's rate-limit headers; an exhausted window
+    or a 429 blocks it until the reported reset time.
+    """
+
+    def __init__(self, requests_per_minute=0):
+        self.capacity = float(requests_per_minute)
+        self.rate = requests_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def reserve(self, now):
+        """Take a token and return 0, or return how long to wait before trying again."""
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.rate <= 0:
+            return 0.0
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def update(self, headers, header_names, now):
+        limit_name, remaining_name, _ = header_names[0]
+        limit = _header_number(headers, limit_name)
+        remaining = _header_number(headers, remaining_name)
+        if limit:
+            self.tokens = min(self.tokens, limit) if self.rate > 0 else limit
+            self.capacity = limit
+            self.rate = limit / 60.0
+        if remaining is not None and self.rate > 0:
+            self.tokens = min(self.tokens, remaining)
+        # Any exhausted window (requests or tokens) holds the bucket until it resets
+        for _, remaining_name, reset_name in header_names:
+            if _header_number(headers, remaining_name) == 0:
+                reset = parse_reset(headers.get(reset_name))
+                if reset:
+                    self.block(reset, now)
+
+    def block(self, seconds, now):
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class _Lane:
+    """Bucket plus a FIFO of waiting requests for one provider and API key."""
+
+    def __init__(self, requests_per_minute):
+        self.bucket = TokenBucket(requests_per_minute)
+        self.waiting = collections.deque()
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+
+class ApiScheduler:
+    """
+    Shared gate in front of the API nodes' HTTP calls.
+
+    Requests for the same provider and key queue first-come first-served, at
+    most max_in_flight at a time and paced by a token bucket learned from the
+    rate-limit headers, so concurrent workflows share the quota instead of
+    racing into 429s. 429s, overloads, 5xx and connection errors are retried
+    with exponential backoff and full jitter, honouring Retry-After. POSTs
+    are not idempotent, so they are only retried after a 429, 503 or 529 or
+    a failure to connect. Every wait watches ComfyUI's interrupt flag.
+    """
+
+    def __init__(self, max_retries, max_in_flight, queue_size, requests_per_minute=0):
+        self.max_retries = max_retries
+        self.max_in_flight = max(1, max_in_flight)
+        self.queue_size = max(1, queue_size)
+        self.requests_per_minute = requests_per_minute
+        self._lanes = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+
+    def request(self, provider, api_key, method, url, **kwargs):
+        """Send through api_transport with queueing and retries; returns the last response."""
+        lane = self._lane(provider, api_key)
+        header_names = RATE_LIMIT_HEADERS.get(provider, [])
+        # A streamed response that fails midway is not retried, the caller has already seen part of it
+        streamed = threading.Event()
+        if kwargs.get("on_line") is not None:
+            on_line = kwargs["on_line"]
+
+            def forward(line):
+                streamed.set()
+                on_line(line)
+            kwargs = {**kwargs, "on_line": forward}
+        retry_statuses = POST_RETRY_STATUSES if method == "POST" else RETRY_STATUSES
+        attempt = 0
+        while True:
+            self._acquire(lane)
+            try:
+                for _, fileobj, _ in (kwargs.get("files") or {}).values():
+                    fileobj.seek(0)  # a retried multipart upload re-reads its buffers
+                response = api_transport.call(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt >= self.max_retries or streamed.is_set() or (method == "POST" and not request_not_sent(e)):
+                    raise
+                delay = self._backoff(attempt)
+                print(f"[oshtz-nodes] {provider} request failed ({e}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            else:
+                now = time.monotonic()
+                with lane.condition:
+                    if header_names:
+                        lane.bucket.update(response.headers, header_names, now)
+                    retry_after = parse_retry_after(response.headers)
+                    if response.status_code == 429 and retry_after:
+                        lane.bucket.block(retry_after, now)
+                if response.status_code not in retry_statuses or attempt >= self.max_retries:
+                    with self._lock:
+                        self.requests += 1
+                    return response
+                delay = retry_after if retry_after is not None else self._backoff(attempt)
+                print(f"[oshtz-nodes] {provider} returned {response.status_code}, retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            finally:
+                self._release(lane)
+            attempt += 1
+            with self._lock:
+                self.retries += 1
+            self._sleep(delay)
+
+    def post(self, provider, api_key, url, **kwargs):
+        return self.request(provider, api_key, "POST", url, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            lanes = list(self._lanes.items())
+            stats = {"requests": self.requests, "retries": self.retries, "throttled_seconds": self.throttled_seconds}
+        stats["lanes"] = {
+            f"{provider}:{key[:8]}": {"in_flight": lane.in_flight, "waiting": len(lane.waiting), "rpm": lane.bucket.capacity}
+            for (provider, key), lane in lanes
+        }
+        return stats
+
+    def _lane(self, provider, api_key):
+        # Keys are only kept hashed
+        lane_key = (provider, content_key(api_key or "")[:16])
+        with self._lock:
+            lane = self._lanes.get(lane_key)
+            if lane is None:
+                lane = self._lanes[lane_key] = _Lane(self.requests_per_minute)
+            return lane
+
+    def _acquire(self, lane):
+        ticket = object()
+        start = time.monotonic()
+        with lane.condition:
+            if len(lane.waiting) >= self.queue_size:
+                raise Exception(f"API request queue is full ({self.queue_size} waiting), try again later")
+            lane.waiting.append(ticket)
+            try:
+                while True:
+                    wait = POLL_SECONDS
+                    if lane.waiting[0] is ticket and lane.in_flight < self.max_in_flight:
+                        wait = lane.bucket.reserve(time.monotonic())
+                        if wait <= 0:
+                            lane.waiting.popleft()
+                            lane.in_flight += 1
+                            return
+                    if processing_interrupted():
+                        raise_if_interrupted()
+                    lane.condition.wait(min(wait, POLL_SECONDS))
+            finally:
+                if ticket in lane.waiting:
+                    lane.waiting.remove(ticket)
+                lane.condition.notify_all()
+                waited = time.monotonic() - start
+                if waited > POLL_SECONDS:
+                    with self._lock:
+                        self.throttled_seconds += waited
+
+    def _release(self, lane):
+        with lane.condition:
+            lane.in_flight -= 1
+            lane.condition.notify_all()
+
+    @staticmethod
+    def _backoff(attempt):
+        # Full jitter: uniform over [0, base * 2^attempt], capped
+        return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+    @staticmethod
+    def _sleep(seconds):
+        deadline = time.monotonic() + seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            if processing_interrupted():
+                raise_if_interrupted()
+            time.sleep(min(remaining, POLL_SECONDS))
+
+
+api_scheduler = ApiScheduler(
+    env_int("OSHTZ_API_MAX_RETRIES", DEFAULT_MAX_RETRIES),
+    env_int("OSHTZ_API_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT),
+    env_int("OSHTZ_API_QUEUE_SIZE", DEFAULT_QUEUE_SIZE),
+    env_int("OSHTZ_API_RPM", 0),
+)
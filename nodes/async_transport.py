@@ -0,0 +1,325 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import json as jsonlib
+import threading
+import time
+
+import requests
+import urllib3
+
+from ..utils import env_int
+from .http_transport import DEFAULT_CONNECT_TIMEOUT, DEFAULT_POOL_MAXSIZE, DEFAULT_READ_TIMEOUT, LineSplitter, http_transport
+
+try:
+    import aiohttp
+except ImportError:  # the sync transport is used instead
+    aiohttp = None
+
+# Run API requests on the PromptServer event loop so they can be interrupted, disable with OSHTZ_API_ASYNC=0
+ASYNC_ENABLED = env_int("OSHTZ_API_ASYNC", 1) != 0
+# How often a waiting node checks for Interrupt and sends a progress heartbeat
+POLL_SECONDS = 0.25
+# sock_connect timeouts have their own type from aiohttp 3.10
+_CONNECT_TIMEOUT_ERROR = getattr(aiohttp, "ConnectionTimeoutError", None)
+
+
+class AsyncResponse:
+    """The parts of requests.Response the API nodes use, filled from an aiohttp response."""
+
+    def __init__(self, url, status_code, reason, headers, content, timing):
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.content = content
+        self.timing = timing
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return jsonlib.loads(self.content)
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error: {self.reason} for url: {self.url}", response=self)
+
+
+def _server_loop():
+    """The running PromptServer event loop, or None outside a live ComfyUI server."""
+    try:
+        import server
+        loop = server.PromptServer.instance.loop
+    except (ImportError, AttributeError):
+        return None
+    if loop is None or not loop.is_running():
+        return None
+    try:
+        if asyncio.get_running_loop() is loop:
+            return None  # already on the loop thread, blocking on it would deadlock
+    except RuntimeError:
+        pass
+    return loop
+
+
+def request_not_sent(error):
+    """
+    True if a requests ConnectionError/Timeout from either transport happened
+    while connecting (DNS, TCP connect, connect timeout), so the server never
+    saw the request and even a POST can safely be sent again.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    connect_errors = (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError)
+    if aiohttp is not None:
+        connect_errors += (aiohttp.ClientConnectorError,)
+    # requests wraps the urllib3 cause in args (MaxRetryError.reason), the async transport chains it
+    pending, seen = [error], set()
+    while pending:
+        cause = pending.pop()
+        if not isinstance(cause, BaseException) or id(cause) in seen:
+            continue
+        seen.add(id(cause))
+        if isinstance(cause, connect_errors):
+            return True
+        pending.extend([cause.__cause__, getattr(cause, "reason", None), *cause.args])
+    return False
+
+
+def processing_interrupted():
+    try:
+        import comfy.model_management
+        return comfy.model_management.processing_interrupted()
+    except ImportError:
+        return False
+
+
+def raise_if_interrupted():
+    """
+    Raise InterruptProcessingException if Interrupt was pressed. The flag is
+    left set, so every other thread waiting on the same prompt stops too;
+    ComfyUI clears it when the next prompt starts.
+    """
+    import comfy.model_management
+    if comfy.model_management.processing_interrupted():
+        raise comfy.model_management.InterruptProcessingException()
+
+
+def map_interruptible(fn, items, max_workers, thread_name_prefix, on_result=None, on_error=None):
+    """
+    Run fn over items on a thread pool and return the results in order.
+
+    on_result(i) / on_error(i) are called on this thread as items finish or
+    fail. On the first failure or interrupt, queued items are cancelled and
+    running ones are waited for (they stop at the interrupt flag), then the
+    exception is raised once: an interrupt through ComfyUI, which consumes the
+    flag only after every worker has seen it.
+    """
+    results = [None] * len(items)
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+    futures = {pool.submit(fn, item): i for i, item in enumerate(items)}
+    try:
+        for future in concurrent.futures.as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception:
+                if on_error is not None:
+                    on_error(i)
+                raise
+            if on_result is not None:
+                on_result(i)
+    except BaseException:
+        pool.shutdown(wait=True, cancel_futures=True)
+        if processing_interrupted():
+            import comfy.model_management
+            comfy.model_management.throw_exception_if_processing_interrupted()
+        raise
+    pool.shutdown()
+    return results
+
+
+def progress_bar(total):
+    """A comfy ProgressBar for the running node, or None outside ComfyUI."""
+    try:
+        import comfy.utils
+        return comfy.utils.ProgressBar(total)
+    except Exception:
+        return None
+
+
+_thread_state = threading.local()
+
+
+@contextlib.contextmanager
+def heartbeats_disabled():
+    """Requests made by this thread inside the block leave the progress bar alone, for callers reporting their own progress."""
+    previous = getattr(_thread_state, "quiet", False)
+    _thread_state.quiet = True
+    try:
+        yield
+    finally:
+        _thread_state.quiet = previous
+
+
+class _Heartbeat:
+    """Advances the node's progress bar with elapsed time while a request is in flight."""
+
+    def __init__(self, expected_seconds):
+        self.expected_seconds = max(1, int(expected_seconds))
+        self.start = time.monotonic()
+        self.bar = None if getattr(_thread_state, "quiet", False) else progress_bar(self.expected_seconds)
+
+    def tick(self):
+        if self.bar is None:
+            return
+        elapsed = int(time.monotonic() - self.start)
+        try:
+            self.bar.update_absolute(min(elapsed, self.expected_seconds - 1))
+        except Exception:
+            self.bar = None
+
+
+class AsyncHttpTransport:
+    """
+    aiohttp client living on the PromptServer event loop.
+
+    Executor threads hand it requests with call(), then wait in short slices:
+    each slice checks ComfyUI's interrupt flag (cancelling the in-flight
+    request at once) and ticks a progress heartbeat, so Interrupt works and
+    the queue UI stays live while remote work is running. Without a running
+    server loop or aiohttp, requests go through the sync http_transport.
+    """
+
+    def __init__(self, pool_size, connect_timeout):
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self._session = None
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.cancelled = 0
+
+    def call(self, method, url, timeout=None, **kwargs):
+        """Blocking request from an executor thread; raises InterruptProcessingException when interrupted."""
+        loop = _server_loop() if ASYNC_ENABLED and aiohttp is not None else None
+        if loop is None:
+            return http_transport.request(method, url, timeout=timeout, **kwargs)
+
+        read_timeout = timeout if timeout is not None else DEFAULT_READ_TIMEOUT
+        future = asyncio.run_coroutine_threadsafe(self.request(method, url, read_timeout, **kwargs), loop)
+        heartbeat = _Heartbeat(read_timeout)
+        while True:
+            try:
+                return future.result(timeout=POLL_SECONDS)
+            except concurrent.futures.TimeoutError:
+                pass
+            if processing_interrupted():
+                future.cancel()
+                with self._lock:
+                    self.cancelled += 1
+                print(f"[oshtz-nodes] Cancelled in-flight {method} {url.split('?', 1)[0]}")
+                raise_if_interrupted()
+            heartbeat.tick()
+
+    def get(self, url, **kwargs):
+        return self.call("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.call("POST", url, **kwargs)
+
+    async def request(self, method, url, timeout, headers=None, json=None, data=None, files=None, on_line=None):
+        """
+        Coroutine doing one request on the loop; errors are mapped to requests exceptions.
+        on_line is called on the loop thread, see HttpTransport.request.
+        """
+        session = self._get_session()
+        body = {}
+        if files:
+            form = aiohttp.FormData()
+            for name, value in (data or {}).items():
+                form.add_field(name, str(value))
+            for name, (filename, fileobj, content_type) in files.items():
+                form.add_field(name, fileobj.getvalue(), filename=filename, content_type=content_type)
+            body["data"] = form
+        elif json is not None:
+            body["json"] = json
+        elif data is not None:
+            body["data"] = data
+
+        trace = {}
+        client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout, sock_read=timeout)
+        start = time.perf_counter()
+        try:
+            async with session.request(method, url, headers=headers, timeout=client_timeout,
+                                       trace_request_ctx=trace, **body) as response:
+                headers_at = time.perf_counter()
+                if on_line is not None and response.status < 400:
+                    splitter = LineSplitter(on_line)
+                    async for chunk in response.content.iter_any():
+                        splitter.feed(chunk)
+                    content = splitter.close()
+                else:
+                    content = await response.read()
+                done_at = time.perf_counter()
+                status, reason, response_headers = response.status, response.reason, dict(response.headers)
+                wire_bytes = response.content.total_bytes
+        except asyncio.TimeoutError as e:
+            if _CONNECT_TIMEOUT_ERROR is not None and isinstance(e, _CONNECT_TIMEOUT_ERROR):
+                raise requests.exceptions.ConnectTimeout(f"Connecting to {url} timed out") from e
+            raise requests.exceptions.Timeout(f"Request to {url} timed out") from e
+        except aiohttp.ClientError as e:
+            raise requests.exceptions.ConnectionError(f"Request to {url} failed: {e}") from e
+
+        connect_seconds = trace.get("connect_seconds", 0.0)
+        timing = {
+            "method": method,
+            "url": url.split("?", 1)[0],
+            "status": status,
+            "reused_connection": connect_seconds == 0.0,
+            "connect_ms": connect_seconds * 1000,
+            "ttfb_ms": (headers_at - start) * 1000,
+            "transfer_ms": (done_at - headers_at) * 1000,
+            "total_ms": (done_at - start) * 1000,
+            "wire_bytes": wire_bytes,
+            "bytes": len(content),
+        }
+        with self._lock:
+            self.requests += 1
+        return AsyncResponse(url, status, reason, response_headers, content, timing)
+
+    def stats(self):
+        with self._lock:
+            return {"requests": self.requests, "cancelled": self.cancelled, "async_enabled": ASYNC_ENABLED and aiohttp is not None}
+
+    def _get_session(self):
+        # Only ever called on the loop thread, so no lock is needed
+        if self._session is None or self._session.closed:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_connection_create_start.append(_on_connect_start)
+            trace_config.on_connection_create_end.append(_on_connect_end)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=self.pool_size, ttl_dns_cache=300),
+                trace_configs=[trace_config],
+            )
+        return self._session
+
+
+async def _on_connect_start(session, context, params):
+    context.trace_request_ctx["connect_start"] = time.perf_counter()
+
+
+async def _on_connect_end(session, context, params):
+    ctx = context.trace_request_ctx
+    ctx["connect_seconds"] = time.perf_counter() - ctx.get("connect_start", time.perf_counter())
+
+
+api_transport = AsyncHttpTransport(
+    env_int("OSHTZ_HTTP_POOL_SIZE", DEFAULT_POOL_MAXSIZE),
+    env_int("OSHTZ_HTTP_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT),
+)
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import struct
+import threading
+import time
+
+try:
+    import folder_paths
+except ImportError:  # running outside ComfyUI
+    folder_paths = None
+
+# Each entry starts with its creation time, so TTLs survive LRU touches of the file mtime
+_HEADER = struct.Struct("<d")
+
+
+def cache_directory(name):
+    try:
+        base_dir = folder_paths.get_user_directory()
+    except AttributeError:
+        base_dir = os.path.join(os.path.dirname(__file__), "..")
+    return os.path.join(base_dir, "oshtz-nodes", "cache", name)
+
+
+def content_key(*parts):
+    """sha256 hex digest over a sequence of str/bytes parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, (bytes, bytearray, memoryview)) else str(part).encode()
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Persistent content-addressed blob cache under the ComfyUI user directory.
+
+    Entries are files named by their key. Reads touch the file mtime, so
+    eviction (once the directory exceeds max_bytes) removes the least recently
+    used entries first. Entries older than ttl_seconds (0 = never) are treated
+    as misses and deleted.
+    """
+
+    def __init__(self, name, max_bytes, ttl_seconds=0):
+        self.root = cache_directory(name)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._bytes_used = None  # computed lazily from a directory scan
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached bytes for key, or None."""
+        entry = self.get_entry(key)
+        return entry[1] if entry is not None else None
+
+    def get_entry(self, key):
+        """Return (creation time, bytes) for key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                header = f.read(_HEADER.size)
+                payload = f.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        created = _HEADER.unpack(header)[0] if len(header) == _HEADER.size else 0.0
+        if self.ttl_seconds > 0 and time.time() - created > self.ttl_seconds:
+            self._remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return created, payload
+
+    def put(self, key, payload):
+        if self.max_bytes <= 0 or len(payload) + _HEADER.size > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(_HEADER.pack(time.time()))
+                f.write(payload)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[oshtz-nodes] Failed to write cache entry {path}: {e}")
+            self._remove(tmp_path)
+            return
+        with self._lock:
+            if self._bytes_used is None:
+                self._bytes_used = self._scan_size()
+            else:
+                self._bytes_used += len(payload) + _HEADER.size - previous
+            if self._bytes_used > self.max_bytes:
+                self._evict()
+
+    def clear(self):
+        with self._lock:
+            for path, _, _ in self._entries():
+                self._remove(path)
+            self._bytes_used = 0
+
+    def stats(self):
+        with self._lock:
+            if self._bytes_used is None:
+                self._bytes_used = self._scan_size()
+            return {
+                "bytes_used": self._bytes_used,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def _entries(self):
+        """(path, size, mtime) of every entry on disk."""
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((entry.path, st.st_size, st.st_mtime))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        # Drop least recently used entries until we're back under 90% of the budget
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self._bytes_used = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._bytes_used <= self.max_bytes * 0.9:
+                break
+            self._remove(path)
+            self._bytes_used -= size
+            self.evictions += 1
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -1,14 +1,23 @@
 import io
 from inspect import cleandoc
 import math
+import time
 import base64
 import requests
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from PIL import Image
 import torch
 
+from ..utils import env_int
+from .disk_cache import DiskCache, content_key
+from .api_scheduler import api_scheduler
+from .async_transport import heartbeats_disabled, map_interruptible, progress_bar
+from .http_transport import http_transport
+from .single_flight import SingleFlight
+
 # ComfyUI imports
 try:
     from comfy.utils import common_upscale
@@ -18,6 +27,7 @@ except ImportError:
     class IO:
         STRING = "STRING"
         INT = "INT"
+        BOOLEAN = "BOOLEAN"
         IMAGE = "IMAGE"
         MASK = "MASK"
         COMBO = "COMBO"
@@ -26,6 +36,52 @@ except ImportError:
 
 _MODEL_ID = "gpt-image-1"
 _OPENAI_API_BASE_URL = "https://api.openai.com/v1"
+# Requests a batched call keeps in flight at once, default for the node's max_concurrency input
+DEFAULT_MAX_CONCURRENCY = 4
+# Threads decoding the images of one response
+DECODE_WORKERS = min(8, os.cpu_count() or 1)
+# On-disk result cache size and expiry, overridable with OSHTZ_GPT_IMAGE_CACHE_MB and OSHTZ_GPT_IMAGE_CACHE_TTL_HOURS (0 = never)
+DEFAULT_CACHE_MB = 1024
+DEFAULT_CACHE_TTL_HOURS = 0
+
+image_cache = DiskCache(
+    "gpt_image_1",
+    env_int("OSHTZ_GPT_IMAGE_CACHE_MB", DEFAULT_CACHE_MB) * 1024 * 1024,
+    env_int("OSHTZ_GPT_IMAGE_CACHE_TTL_HOURS", DEFAULT_CACHE_TTL_HOURS) * 3600,
+)
+# Identical requests running at the same time (across nodes, prompts or batch jobs) share one API call
+image_requests = SingleFlight("GPT Image 1")
+
+# Upload encoders for edit images: format -> (PIL format, MIME type, file extension); masks are always PNG
+UPLOAD_FORMATS = {
+    "png": ("PNG", "image/png", "png"),
+    "webp": ("WEBP", "image/webp", "webp"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+}
+# Rows converted per step in tensor_to_uint8, bounding the float temporary to a strip of the image
+_UINT8_ROWS_PER_CHUNK = 64
+
+def tensor_to_uint8(tensor):
+    """Convert an [H, W, C] float tensor in 0..1 to a uint8 numpy array without a full-size float temporary."""
+    out = torch.empty(tensor.shape, dtype=torch.uint8)
+    for start in range(0, tensor.shape[0], _UINT8_ROWS_PER_CHUNK):
+        rows = tensor[start:start + _UINT8_ROWS_PER_CHUNK]
+        out[start:start + _UINT8_ROWS_PER_CHUNK].copy_(torch.mul(rows, 255.0).clamp_(0, 255))
+    return out.numpy()
+
+def encode_upload(img, upload_format="png", png_compress_level=6, upload_quality=95, label="image"):
+    """Encode a PIL image for upload and log its size and encode time."""
+    pil_format, _, _ = UPLOAD_FORMATS[upload_format]
+    start = time.perf_counter()
+    if pil_format == "JPEG" and img.mode != "RGB":
+        img = img.convert("RGB")  # JPEG has no alpha channel
+    options = {"compress_level": png_compress_level} if pil_format == "PNG" else {"quality": upload_quality}
+    buffer = io.BytesIO()
+    img.save(buffer, format=pil_format, **options)
+    buffer.seek(0)
+    print(f"GPT Image 1: encoded {label} {img.width}x{img.height} as {upload_format}, "
+          f"{buffer.getbuffer().nbytes} bytes in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return buffer
 
 def downscale_input(image_tensor):
     try:
@@ -64,7 +120,7 @@ def downscale_input(image_tensor):
         # In case of any error, return the original tensor
         return image_tensor
 
-def prepare_image_for_api(image_tensor):
+def prepare_image_for_api(image_tensor, upload_format="png", png_compress_level=6, upload_quality=95):
     # Debug original tensor shape
     original_shape = image_tensor.shape
     
@@ -97,7 +153,7 @@ def prepare_image_for_api(image_tensor):
     scaled_image_tensor = downscale_input(tensor)
     
     # Convert to numpy and prepare for PIL
-    image_np = (scaled_image_tensor.numpy() * 255).clip(0, 255).astype(np.uint8)
+    image_np = tensor_to_uint8(scaled_image_tensor)
     
     # Create PIL image
     if image_np.shape[-1] == 4:
@@ -108,13 +164,9 @@ def prepare_image_for_api(image_tensor):
         # This shouldn't happen due to our previous checks, but just in case
         raise ValueError(f"Unexpected number of channels after processing: {image_np.shape[-1]}")
     
-    # Convert to bytes
-    img_byte_arr = io.BytesIO()
-    img.save(img_byte_arr, format='PNG')
-    img_byte_arr.seek(0)
-    return img_byte_arr
+    return encode_upload(img, upload_format, png_compress_level, upload_quality)
 
-def prepare_mask_for_api(mask_tensor, image_shape_hw):
+def prepare_mask_for_api(mask_tensor, image_shape_hw, png_compress_level=6):
     # Debug original tensor shape
     original_shape = mask_tensor.shape
     print(f"Preparing mask with shape {original_shape}, target shape {image_shape_hw}")
@@ -166,50 +218,153 @@ def prepare_mask_for_api(mask_tensor, image_shape_hw):
             print("Creating empty mask as fallback")
             mask = torch.zeros(image_shape_hw, dtype=torch.float32)
     
-    # Continue with the original conversion to RGBA
-    mask_tensor_cpu = mask
-    height, width = mask_tensor_cpu.shape
-    rgba_mask_np = np.zeros((height, width, 4), dtype=np.float32)
-    rgba_mask_np[mask_tensor_cpu > 0.5, 3] = 0.0
-    rgba_mask_np[mask_tensor_cpu <= 0.5, 3] = 1.0
-    mask_np_uint8 = (rgba_mask_np * 255).clip(0, 255).astype(np.uint8)
-    mask_img = Image.fromarray(mask_np_uint8, 'RGBA')
-    
-    # Convert to bytes
-    mask_byte_arr = io.BytesIO()
-    mask_img.save(mask_byte_arr, format='PNG')
-    mask_byte_arr.seek(0)
+    # Transparent (alpha 0) where the mask marks the edit area, opaque black elsewhere
+    height, width = mask.shape
+    alpha = (mask <= 0.5).to(torch.uint8).mul_(255).numpy()
+    mask_img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    mask_img.putalpha(Image.fromarray(alpha, "L"))
+
+    mask_byte_arr = encode_upload(mask_img, "png", png_compress_level, label="mask")
     print("Mask processing completed successfully")
     return mask_byte_arr
 
-def process_api_response(response_json):
+def open_result_image(item):
+    """Open one response data item (b64_json or url) as a lazily decoded PIL image, or None."""
+    b64_data = item.get('b64_json')
+    image_url = item.get('url')
+    try:
+        if b64_data:
+            img_data = base64.b64decode(b64_data)
+        elif image_url:
+            img_response = http_transport.get(image_url, timeout=30)
+            img_response.raise_for_status()
+            img_data = img_response.content
+        else:
+            return None
+        return Image.open(io.BytesIO(img_data))
+    except Exception as e:
+        print(f"GPT Image 1: skipping unreadable result image: {e}")
+        return None
+
+def decode_into(img, out, mask_out=None):
+    """Decode a PIL image into out, an [H, W, C] slice of the result batch, and its inverted alpha into mask_out."""
+    rgba = out.shape[-1] == 4 or mask_out is not None
+    # np.array gives a writable uint8 copy (np.asarray of a PIL image is read-only, which torch warns about)
+    pixels = torch.from_numpy(np.array(img.convert("RGBA" if rgba else "RGB")))
+    out.copy_(pixels[..., :out.shape[-1]]).div_(255.0)
+    if mask_out is not None:
+        # Like LoadImage, the MASK is 1 where the image is transparent
+        mask_out.copy_(pixels[..., 3]).div_(-255.0).add_(1.0)
+
+def process_api_response(response_json, channels=4, with_mask=False, dtype=torch.float32):
+    """Decode the images of a response into an [N, H, W, channels] batch, plus an [N, H, W] MASK batch if with_mask."""
     if 'data' not in response_json or not response_json['data']:
         error_message = response_json.get('error', {}).get('message', 'Unknown error')
         raise Exception(f"API Error: {error_message}")
-    image_tensors = []
-    for i, item in enumerate(response_json['data']):
-        b64_data = item.get('b64_json')
-        image_url = item.get('url')
-        img = None
+    items = response_json['data']
+    workers = max(1, min(DECODE_WORKERS, len(items)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="oshtz-gpt-image-decode") as pool:
+        # URL items are fetched concurrently over pooled connections; base64 items only get their headers parsed here
+        images = [img for img in pool.map(open_result_image, items) if img is not None]
+        if not images:
+            raise Exception("Failed to process any images from the API response")
+
+        width, height = images[0].size
+        if any(img.size != (width, height) for img in images):
+            print("GPT Image 1: result images differ in size, resizing to the first one")
+            images = [img if img.size == (width, height) else img.resize((width, height), Image.LANCZOS) for img in images]
+
+        # Decode every image straight into its slice of one preallocated batch (PIL releases the GIL while decoding)
+        batch = torch.empty((len(images), height, width, channels), dtype=dtype)
+        mask = torch.empty((len(images), height, width), dtype=dtype) if with_mask else None
+        futures = [
+            pool.submit(decode_into, img, batch[i], mask[i] if with_mask else None)
+            for i, img in enumerate(images)
+        ]
+        decoded = []
+        for i, future in enumerate(futures):
+            try:
+                future.result()
+                decoded.append(i)
+            except Exception as e:
+                print(f"GPT Image 1: failed to decode result image {i}: {e}")
+    if not decoded:
+        raise Exception("Failed to process any images from the API response")
+    if len(decoded) < len(images):
+        batch = batch[decoded]
+        mask = mask[decoded] if with_mask else None
+    return batch, mask
+
+def split_prompts(prompt, separator):
+    """Split prompt on separator into the prompts to request separately; no separator means one prompt."""
+    if not separator:
+        return [prompt]
+    prompts = [part.strip() for part in prompt.split(separator)]
+    return [part for part in prompts if part] or [prompt]
+
+def send_image_request(endpoint, api_key, data, files, channels=4, with_mask=False, dtype=torch.float32):
+    """POST one generation or edit request and decode its images, see process_api_response."""
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+    }
+    try:
+        if files:
+            response = api_scheduler.post("openai", api_key, endpoint, headers=headers, data=data, files=files, timeout=120)
+        else:
+            headers["Content-Type"] = "application/json"
+            response = api_scheduler.post("openai", api_key, endpoint, headers=headers, json=data, timeout=120)
+        response.raise_for_status()
+        response_json = response.json()
+    except requests.exceptions.RequestException as e:
+        error_detail = ""
         try:
-            if b64_data:
-                img_data = base64.b64decode(b64_data)
-                img = Image.open(io.BytesIO(img_data))
-            elif image_url:
-                img_response = requests.get(image_url, timeout=30)
-                img_response.raise_for_status()
-                img = Image.open(io.BytesIO(img_response.content))
+            if e.response is not None:
+                error_detail = e.response.text
+        except Exception:
+            pass
+        raise Exception(f"OpenAI API request failed: {e}\n{error_detail}") from e
+    return process_api_response(response_json, channels, with_mask, dtype)
+
+def concat_image_batches(batches):
+    """Concatenate per-request IMAGE (or MASK) batches in order, resizing any that came back at a different size."""
+    height, width = batches[0].shape[1:3]
+    resized = []
+    for batch in batches:
+        if batch.shape[1:3] != (height, width):
+            print(f"Resizing {tuple(batch.shape[1:3])} result to {(height, width)} to match the first request")
+            if batch.ndim == 3:
+                batch = common_upscale(batch.unsqueeze(1), width, height, "bilinear", "disabled").squeeze(1)
             else:
-                continue
-            img = img.convert("RGBA")
-            img_array = np.array(img).astype(np.float32) / 255.0
-            img_tensor = torch.from_numpy(img_array)
-            image_tensors.append(img_tensor)
-        except Exception as e:
-            continue
-    if not image_tensors:
-        raise Exception("Failed to process any images from the API response")
-    return torch.stack(image_tensors, dim=0)
+                batch = common_upscale(batch.movedim(-1, 1), width, height, "bilinear", "disabled").movedim(1, -1)
+        resized.append(batch)
+    return torch.cat(resized, dim=0) if len(resized) > 1 else resized[0]
+
+def upload_key(files):
+    """Digest of the exact uploaded image/mask bytes of an edit request."""
+    parts = []
+    for name in sorted(files):
+        parts += [name, files[name][1].getvalue()]
+    return content_key(*parts)
+
+
+def request_cache_key(endpoint, data, seed, files_key=None, channels=4, with_mask=False):
+    """Cache key of one request: endpoint, payload, seed and output layout plus the upload digest from upload_key."""
+    return content_key(endpoint, json.dumps(data, sort_keys=True), seed, channels, with_mask, files_key or "")
+
+def encode_cached_images(images, masks=None):
+    """Store result batches as raw uint8 arrays (results are 8-bit images, so this is lossless)."""
+    arrays = {"images": (images.float().clamp(0, 1) * 255).round().to(torch.uint8).cpu().numpy()}
+    if masks is not None:
+        arrays["masks"] = (masks.float().clamp(0, 1) * 255).round().to(torch.uint8).cpu().numpy()
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+def decode_cached_images(payload, dtype=torch.float32):
+    with np.load(io.BytesIO(payload), allow_pickle=False) as arrays:
+        images = torch.from_numpy(arrays["images"]).to(dtype).div_(255.0)
+        masks = torch.from_numpy(arrays["masks"]).to(dtype).div_(255.0) if "masks" in arrays.files else None
+    return images, masks
 
 class GPTImage1(ComfyNodeABC):
     """
@@ -235,23 +390,27 @@ class GPTImage1(ComfyNodeABC):
                 "n": (IO.INT, {"default": 1, "min": 1, "max": 8, "step": 1, "display": "number", "tooltip": "How many images to generate"}),
                 "image": (IO.IMAGE, {"default": None, "tooltip": "Optional reference image for editing (requires 'mask' too)"}),
                 "mask": (IO.MASK, {"default": None, "tooltip": "Optional mask for inpainting (requires 'image' too, white=edit area)"}),
+                "prompt_separator": (IO.STRING, {"multiline": False, "default": "", "tooltip": "Split the prompt on this text and send each part as its own request (empty = one prompt)"}),
+                "max_concurrency": (IO.INT, {"default": DEFAULT_MAX_CONCURRENCY, "min": 1, "max": 16, "step": 1, "display": "number", "tooltip": "How many requests a batch of prompts or images runs at once"}),
+                "use_cache": (IO.BOOLEAN, {"default": True, "tooltip": "Reuse results saved on disk for an identical request (prompt, settings, seed, image and mask); off always calls the API"}),
+                "upload_format": (IO.COMBO, {"options": list(UPLOAD_FORMATS), "default": "png", "tooltip": "Encoding of the uploaded edit image; webp/jpeg are much smaller and faster to send (the mask is always PNG)"}),
+                "png_compress_level": (IO.INT, {"default": 6, "min": 0, "max": 9, "step": 1, "display": "number", "tooltip": "PNG zlib level for uploads: 0-1 encode fastest, 9 is smallest"}),
+                "upload_quality": (IO.INT, {"default": 95, "min": 1, "max": 100, "step": 1, "display": "number", "tooltip": "Quality of webp/jpeg uploads"}),
+                "output_alpha": (IO.COMBO, {"options": ["auto", "rgb", "rgba"], "default": "auto", "tooltip": "auto returns RGB for opaque results and RGBA for transparent ones; rgb always drops alpha (it's still on the MASK output)"}),
+                "output_precision": (IO.COMBO, {"options": ["fp32", "fp16"], "default": "fp32", "tooltip": "fp16 halves the memory of the returned images (some downstream nodes expect fp32)"}),
             }
         }
 
-    RETURN_TYPES = (IO.IMAGE,)
+    RETURN_TYPES = (IO.IMAGE, IO.MASK)
     FUNCTION = "api_call"
     CATEGORY = "api/OpenAI"
     DESCRIPTION = cleandoc(__doc__ or f"OpenAI {_MODEL_ID} Image (Direct API Key)")
     API_NODE = False
 
-    def api_call(self, prompt, api_key, seed=0, quality="low", background="opaque", moderation="low", size="auto", n=1, image=None, mask=None):
+    def api_call(self, prompt, api_key, seed=0, quality="low", background="opaque", moderation="low", size="auto", n=1, image=None, mask=None, prompt_separator="", max_concurrency=DEFAULT_MAX_CONCURRENCY, use_cache=True, upload_format="png", png_compress_level=6, upload_quality=95, output_alpha="auto", output_precision="fp32"):
         final_api_key = api_key.strip() or os.environ.get('OPENAI_API_KEY', '').strip()
         if not final_api_key:
             raise ValueError("An OpenAI API key is required. Please provide it as input or set the OPENAI_API_KEY environment variable.")
-        headers = {
-            "Authorization": f"Bearer {final_api_key}",
-        }
-        files = {}
         data = {
             "model": _MODEL_ID,
             "prompt": prompt,
@@ -262,75 +421,133 @@ class GPTImage1(ComfyNodeABC):
             "moderation": moderation,
             # 'response_format': 'b64_json',  # Removed because it's not supported
         }
+        prompts = split_prompts(prompt, prompt_separator)
         is_edit = image is not None and mask is not None
         if is_edit:
             endpoint = f"{_OPENAI_API_BASE_URL}/images/edits"
-            if image.shape[0] != 1 or mask.shape[0] != 1:
-                raise ValueError("Image editing currently supports only batch size 1 for image and mask.")
-            
-            # Add diagnostic info about image tensor shape
-            try:
-                print(f"Image tensor shape before processing: {image.shape}")
-                
-                # Check specifically for the 941 channels error from the original prompt
-                if len(image.squeeze(0).shape) == 3 and image.squeeze(0).shape[-1] == 941:
-                    print("Detected 941 channels error case - applying special handling")
-                    # Create a new tensor with just 3 channels from the original data
-                    fixed_tensor = image.squeeze(0)[..., :3].clone()
-                    print(f"Created fixed tensor with shape {fixed_tensor.shape}")
-                    image_bytes = prepare_image_for_api(fixed_tensor)
-                else:
-                    image_bytes = prepare_image_for_api(image.squeeze(0))
-                
-                print("Image processed successfully")
-                
-                print(f"Mask tensor shape before processing: {mask.shape}")
-                mask_bytes = prepare_mask_for_api(mask.squeeze(0), image.shape[1:3])
-                print("Mask processed successfully")
-                
-                files['image'] = ('image.png', image_bytes, 'image/png')
-                files['mask'] = ('mask.png', mask_bytes, 'image/png')
-            except Exception as e:
-                # Provide detailed error information for debugging
-                print(f"Error during image/mask processing: {e}")
-                if isinstance(image, torch.Tensor):
-                    try:
-                        print(f"Image tensor details - shape: {image.shape}, dtype: {image.dtype}")
-                        print(f"Squeezed shape: {image.squeeze(0).shape if len(image.shape) > 3 else 'N/A'}")
-                        if len(image.shape) >= 3:
-                            print(f"Min/max values: {image.min().item():.4f}, {image.max().item():.4f}")
-                            
-                        # Additional diagnostic for unusual channel counts
-                        if len(image.squeeze(0).shape) == 3 and image.squeeze(0).shape[-1] > 4:
-                            large_channel_count = image.squeeze(0).shape[-1]
-                            print(f"WARNING: Unusually large channel count detected: {large_channel_count}")
-                            print("This is likely the cause of the error. The code has been updated to handle this case.")
-                    except Exception as inner_e:
-                        print(f"Error during diagnostic logging: {inner_e}")
-                
-                raise ValueError(f"Failed to process image or mask for API: {e}")
+            if mask.shape[0] not in (1, image.shape[0]):
+                raise ValueError(f"Mask batch size ({mask.shape[0]}) must be 1 or match the image batch size ({image.shape[0]}).")
+            # One edit request per (prompt, image) pair; a single mask applies to every image
+            jobs = [(job_prompt, index) for job_prompt in prompts for index in range(image.shape[0])]
         elif image is not None or mask is not None:
             raise ValueError("For image editing, both 'image' and 'mask' inputs are required.")
         else:
             endpoint = f"{_OPENAI_API_BASE_URL}/images/generations"
+            jobs = [(job_prompt, None) for job_prompt in prompts]
+
+        # Opaque results have alpha 1 everywhere, so only keep a channel (and a real MASK) when it carries information
+        with_mask = background == "transparent"
+        channels = 4 if output_alpha == "rgba" or (output_alpha == "auto" and with_mask) else 3
+        dtype = torch.float16 if output_precision == "fp16" else torch.float32
+
+        # Each image/mask pair is encoded and hashed once, however many prompts edit it
+        uploads = {}
+        if is_edit:
+            for index in range(image.shape[0]):
+                files = self.prepare_edit_files(
+                    image[index], mask[index if mask.shape[0] > 1 else 0], upload_format, png_compress_level, upload_quality
+                )
+                uploads[index] = (files, upload_key(files))
+
+        def run(job):
+            job_prompt, index = job
+            job_data = {**data, "prompt": job_prompt}
+            files, files_key = {}, None
+            if index is not None:
+                shared, files_key = uploads[index]
+                # Own buffers per request: concurrent requests and retries each read them from the start
+                files = {name: (filename, io.BytesIO(buffer.getvalue()), content_type)
+                         for name, (filename, buffer, content_type) in shared.items()}
+            request_key = request_cache_key(endpoint, job_data, seed, files_key, channels, with_mask)
+            cache_key = request_key if use_cache else None
+
+            def fetch():
+                if cache_key is not None:
+                    cached = image_cache.get(cache_key)
+                    if cached is not None:
+                        print(f"GPT Image 1: using cached result for request {cache_key[:12]}")
+                        return decode_cached_images(cached, dtype)
+                images, masks = send_image_request(endpoint, final_api_key, job_data, files, channels, with_mask, dtype)
+                if cache_key is not None:
+                    image_cache.put(cache_key, encode_cached_images(images, masks))
+                return images, masks
+
+            if not use_cache:
+                return fetch()  # the images API has no seed, so an uncached request is a fresh sample
+            # Cached requests already return the same images, so concurrent duplicates can share one call
+            return image_requests.do(content_key(request_key, content_key(final_api_key), dtype), fetch)
+
+        if len(jobs) == 1:
+            results = [run(jobs[0])]
+        else:
+            # Independent requests run side by side, so the batch takes about as long as its slowest request
+            workers = max(1, min(max_concurrency, len(jobs)))
+            print(f"GPT Image 1: sending {len(jobs)} requests, up to {workers} at a time")
+            bar = progress_bar(len(jobs))
+
+            def run_quietly(job):
+                with heartbeats_disabled():  # the batch progress bar counts finished requests instead
+                    return run(job)
+
+            def on_result(i):
+                if bar is not None:
+                    bar.update(1)
+
+            results = map_interruptible(run_quietly, jobs, workers, "oshtz-gpt-image", on_result=on_result)
+        images = concat_image_batches([result[0] for result in results])
+        if with_mask:
+            masks = concat_image_batches([result[1] for result in results])
+        else:
+            # Same placeholder LoadImage returns for images without alpha
+            masks = torch.zeros((images.shape[0], 64, 64), dtype=dtype)
+        return (images, masks)
+
+    def prepare_edit_files(self, image, mask, upload_format="png", png_compress_level=6, upload_quality=95):
+        """Encode one [H, W, C] image and its [H, W] mask as the multipart files of an edit request."""
+        encoder = {"upload_format": upload_format, "png_compress_level": png_compress_level, "upload_quality": upload_quality}
+        # Add diagnostic info about image tensor shape
         try:
-            if files:
-                response = requests.post(endpoint, headers=headers, data=data, files=files, timeout=120)
+            print(f"Image tensor shape before processing: {image.shape}")
+
+            # Check specifically for the 941 channels error from the original prompt
+            if len(image.shape) == 3 and image.shape[-1] == 941:
+                print("Detected 941 channels error case - applying special handling")
+                # Create a new tensor with just 3 channels from the original data
+                fixed_tensor = image[..., :3].clone()
+                print(f"Created fixed tensor with shape {fixed_tensor.shape}")
+                image_bytes = prepare_image_for_api(fixed_tensor, **encoder)
             else:
-                headers["Content-Type"] = "application/json"
-                response = requests.post(endpoint, headers=headers, json=data, timeout=120)
-            response.raise_for_status()
-            response_json = response.json()
-        except requests.exceptions.RequestException as e:
-            error_detail = ""
-            try:
-                if e.response is not None:
-                    error_detail = e.response.text
-            except Exception:
-                pass
-            raise Exception(f"OpenAI API request failed: {e}\n{error_detail}") from e
-        img_tensor_batch = process_api_response(response_json)
-        return (img_tensor_batch,)
+                image_bytes = prepare_image_for_api(image, **encoder)
+
+            print("Image processed successfully")
+
+            print(f"Mask tensor shape before processing: {mask.shape}")
+            mask_bytes = prepare_mask_for_api(mask, image.shape[0:2], png_compress_level)
+            print("Mask processed successfully")
+
+            return {
+                'image': (f'image.{UPLOAD_FORMATS[upload_format][2]}', image_bytes, UPLOAD_FORMATS[upload_format][1]),
+                'mask': ('mask.png', mask_bytes, 'image/png'),
+            }
+        except Exception as e:
+            # Provide detailed error information for debugging
+            print(f"Error during image/mask processing: {e}")
+            if isinstance(image, torch.Tensor):
+                try:
+                    print(f"Image tensor details - shape: {image.shape}, dtype: {image.dtype}")
+                    if len(image.shape) >= 3:
+                        print(f"Min/max values: {image.min().item():.4f}, {image.max().item():.4f}")
+
+                    # Additional diagnostic for unusual channel counts
+                    if len(image.shape) == 3 and image.shape[-1] > 4:
+                        large_channel_count = image.shape[-1]
+                        print(f"WARNING: Unusually large channel count detected: {large_channel_count}")
+                        print("This is likely the cause of the error. The code has been updated to handle this case.")
+                except Exception as inner_e:
+                    print(f"Error during diagnostic logging: {inner_e}")
+
+            raise ValueError(f"Failed to process image or mask for API: {e}")
+
 
 NODE_CLASS_MAPPINGS = {
     "GPTImage1": GPTImage1,
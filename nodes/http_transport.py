@@ -0,0 +1,170 @@
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from ..utils import env_int
+
+# Distinct hosts kept pooled, overridable with OSHTZ_HTTP_POOLS
+DEFAULT_POOL_CONNECTIONS = 8
+# Keep-alive connections per host, overridable with OSHTZ_HTTP_POOL_SIZE
+DEFAULT_POOL_MAXSIZE = 16
+# Seconds allowed for DNS + TCP + TLS, overridable with OSHTZ_HTTP_CONNECT_TIMEOUT
+DEFAULT_CONNECT_TIMEOUT = 10
+# Read timeout used when the caller doesn't pass one
+DEFAULT_READ_TIMEOUT = 120
+# Per-request timings kept for stats()
+RECENT_TIMINGS = 256
+
+# Seconds spent in connect() (DNS, TCP and TLS) by the current thread's request; 0 when a pooled connection was reused
+_connect_time = threading.local()
+
+
+class _TimedConnectMixin:
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            _connect_time.seconds = getattr(_connect_time, "seconds", 0.0) + time.perf_counter() - start
+
+
+class _TimedHTTPConnection(_TimedConnectMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class LineSplitter:
+    """Passes a chunked body to on_line one line at a time (bytes, without the line ending), keeping the whole body."""
+
+    def __init__(self, on_line):
+        self.on_line = on_line
+        self.body = bytearray()
+        self._pending = b""
+
+    def feed(self, chunk):
+        self.body += chunk
+        *lines, self._pending = (self._pending + chunk).split(b"\n")
+        for line in lines:
+            self.on_line(line.rstrip(b"\r"))
+
+    def close(self):
+        if self._pending:
+            self.on_line(self._pending.rstrip(b"\r"))
+            self._pending = b""
+        return bytes(self.body)
+
+
+class HttpTransport:
+    """
+    Process-wide HTTP client shared by the API nodes.
+
+    One requests.Session with per-host keep-alive pools, so repeated calls to
+    the same API skip DNS, TCP and TLS setup. Responses are gzip-negotiated and
+    fully read before they are returned; each one carries a `timing` dict with
+    connect, time-to-first-byte and transfer times in milliseconds plus the
+    bytes received on the wire.
+    """
+
+    def __init__(self, pool_connections, pool_maxsize, connect_timeout):
+        self.connect_timeout = connect_timeout
+        self.session = requests.Session()
+        self.session.headers["Accept-Encoding"] = "gzip, deflate"
+        adapter = _TimedAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._recent = deque(maxlen=RECENT_TIMINGS)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def request(self, method, url, timeout=None, on_line=None, **kwargs):
+        """
+        Like requests.request; timeout is the read timeout, connects use connect_timeout.
+        With on_line, a successful response body is passed to it line by line as it
+        arrives (for server-sent events) and is still available as content afterwards.
+        """
+        read_timeout = timeout if timeout is not None else DEFAULT_READ_TIMEOUT
+        _connect_time.seconds = 0.0
+        start = time.perf_counter()
+        response = self.session.request(
+            method, url, timeout=(self.connect_timeout, read_timeout), stream=True, **kwargs
+        )
+        headers_at = time.perf_counter()
+        try:
+            if on_line is not None and response.ok:
+                splitter = LineSplitter(on_line)
+                for chunk in response.iter_content(chunk_size=None):
+                    splitter.feed(chunk)
+                response._content = splitter.close()  # what .content would have read
+            else:
+                response.content  # read the body now so the connection goes back to the pool
+        finally:
+            response.close()
+        done_at = time.perf_counter()
+
+        connect_seconds = _connect_time.seconds
+        wire_bytes = response.raw.tell() if hasattr(response.raw, "tell") else len(response.content)
+        response.timing = {
+            "method": method,
+            "url": url.split("?", 1)[0],
+            "status": response.status_code,
+            "reused_connection": connect_seconds == 0.0,
+            "connect_ms": connect_seconds * 1000,
+            "ttfb_ms": (headers_at - start) * 1000,
+            "transfer_ms": (done_at - headers_at) * 1000,
+            "total_ms": (done_at - start) * 1000,
+            "wire_bytes": wire_bytes,
+            "bytes": len(response.content),
+        }
+        with self._lock:
+            self.requests += 1
+            self.new_connections += connect_seconds > 0.0
+            self._recent.append(response.timing)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        with self._lock:
+            recent = list(self._recent)
+            stats = {"requests": self.requests, "new_connections": self.new_connections}
+        if recent:
+            for field in ("connect_ms", "ttfb_ms", "transfer_ms", "total_ms"):
+                stats[f"avg_{field}"] = sum(t[field] for t in recent) / len(recent)
+        return stats
+
+
+http_transport = HttpTransport(
+    env_int("OSHTZ_HTTP_POOLS", DEFAULT_POOL_CONNECTIONS),
+    env_int("OSHTZ_HTTP_POOL_SIZE", DEFAULT_POOL_MAXSIZE),
+    env_int("OSHTZ_HTTP_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT),
+)
@@ -1,9 +1,8 @@
 import os
 import json
-import requests
 import random
 from enum import Enum
-from typing import List, Dict, Union, Optional, Any
+from typing import List, Dict, Union, Optional, Any, ClassVar
 import torch
 from torch import Tensor
 from pydantic import BaseModel
@@ -11,6 +10,20 @@ from PIL import Image
 import base64
 import io
 from ..utils import ensure_package, tensor2pil, pil2base64
+from .api_scheduler import api_scheduler
+from .disk_cache import content_key
+from .async_transport import api_transport, heartbeats_disabled, map_interruptible, progress_bar
+from .http_transport import http_transport
+from .llm_batch import run_provider_batch
+from .llm_cache import CACHE_MODES, llm_response_cache
+from .llm_stream import STREAM_FIELDS, ChatStream, publish_preview, stream_stats
+from .single_flight import SingleFlight, single_flight_stats
+
+try:
+    import server
+    from aiohttp import web
+except ImportError:  # running outside ComfyUI
+    server = None
 
 # Constants and model lists
 gpt_models = [
@@ -27,6 +40,8 @@ aws_regions = [
     "eu-central-1", "eu-west-3", "eu-west-1", "ap-south-3",
 ]
 bedrock_anthropic_versions = ["bedrock-2023-05-31"]
+# Requests a prompt batch keeps in flight at once, default for the node's max_concurrency input
+DEFAULT_BATCH_CONCURRENCY = 4
 bedrock_claude3_models = [
     "anthropic.claude-3-haiku-20240307", "anthropic.claude-3-sonnet-20240229",
     "anthropic.claude-3-opus-20240229", "anthropic.claude-3-5-sonnet-20240620",
@@ -100,12 +115,58 @@ class LLMMessage(BaseModel):
             "content": self.content
         }
 
+# Identical chat requests running at the same time share one API call
+llm_requests = SingleFlight("LLM")
+
+def post_chat_request(provider, api_key, url, data, headers, timeout, seed=None, cache="off", stream=False, node_id=None):
+    """
+    POST a chat request and return its JSON body. Identical concurrent requests are coalesced
+    only when they should give the same answer (temperature 0 or an explicit seed); otherwise
+    each caller gets its own sample.
+    cache ("off", "read", "write" or "readwrite") controls the response cache; seed is part of
+    the cache key even for providers that don't take one, so changing it forces a new response.
+    With stream, the completion is requested as server-sent events and its text is shown live
+    in the preview of node_id; the returned body has the usual non-streaming shape.
+    """
+    cache_key = llm_response_cache.key(provider, url, data, seed) if cache != "off" else None
+    if cache in ("read", "readwrite"):
+        cached = llm_response_cache.get(cache_key)
+        if cached is not None:
+            print(f"[oshtz-nodes] LLM: using cached response {cache_key[:12]}")
+            return cached
+    def send():
+        if not stream:
+            return api_scheduler.post(provider, api_key, url, json=data, headers=headers, timeout=timeout).json()
+        chat_stream = ChatStream(provider, data["model"], node_id)
+        response = api_scheduler.post(
+            provider, api_key, url, json={**data, **STREAM_FIELDS[provider]}, headers=headers, timeout=timeout,
+            on_line=chat_stream.on_line,
+        )
+        if response.status_code in (400, 422):
+            # Some OpenAI-compatible servers reject stream/stream_options; ask again for a plain response
+            print(f"[oshtz-nodes] LLM: {provider} rejected a streamed request (HTTP {response.status_code}), retrying without streaming")
+            return api_scheduler.post(provider, api_key, url, json=data, headers=headers, timeout=timeout).json()
+        if not response.ok or "text/event-stream" not in response.headers.get("Content-Type", ""):
+            return response.json()  # errors, or a server that ignored stream and answered in one piece
+        return chat_stream.result()
+
+    if data.get("temperature") == 0 or data.get("seed") is not None:
+        key = content_key(provider, url, content_key(api_key), json.dumps(data, sort_keys=True))
+        response = llm_requests.do(key, send)
+    else:
+        response = send()
+    if cache in ("write", "readwrite") and response.get("error") is None:
+        llm_response_cache.put(cache_key, response)
+    return response
+
 class OpenAIApi(BaseModel):
+    provider: ClassVar[str] = "openai"
     api_key: str
     endpoint: Optional[str] = "https://api.openai.com/v1"
     timeout: Optional[int] = 60
 
-    def chat(self, messages: List[LLMMessage], config: LLMConfig, seed=None):
+    def build_request(self, messages: List[LLMMessage], config: LLMConfig, seed=None):
+        """URL, JSON body and headers of a chat completion request."""
         if config.model not in gpt_models:
             raise Exception(f"Must provide an OpenAI model, got {config.model}")
         formatted_messages = [m.to_openai_message() for m in messages]
@@ -119,23 +180,32 @@ class OpenAIApi(BaseModel):
         if seed is not None:
             data["seed"] = seed
         headers = {"Authorization": f"Bearer {self.api_key}"}
-        response = requests.post(url, json=data, headers=headers, timeout=self.timeout)
-        data: Dict = response.json()
+        return url, data, headers
+
+    @staticmethod
+    def parse_response(data: Dict):
         if data.get("error", None) is not None:
             raise Exception(data.get("error").get("message"))
         return data["choices"][0]["message"]["content"]
 
+    def chat(self, messages: List[LLMMessage], config: LLMConfig, seed=None, cache="off", stream=False, node_id=None):
+        url, data, headers = self.build_request(messages, config, seed)
+        data: Dict = post_chat_request("openai", self.api_key, url, data, headers, self.timeout, seed, cache, stream, node_id)
+        return self.parse_response(data)
+
     def complete(self, prompt: str, config: LLMConfig, seed=None):
         messages = [LLMMessage.create(role=LLMMessageRole.user, text=prompt)]
         return self.chat(messages, config, seed)
 
 class ClaudeApi(BaseModel):
+    provider: ClassVar[str] = "anthropic"
     api_key: str
     endpoint: Optional[str] = "https://api.anthropic.com/v1"
     version: Optional[str] = "2023-06-01"
     timeout: Optional[int] = 60
 
-    def chat(self, messages: List[LLMMessage], config: LLMConfig):
+    def build_request(self, messages: List[LLMMessage], config: LLMConfig, seed=None):
+        """URL, JSON body and headers of a messages request (Claude takes no seed)."""
         if config.model not in claude3_models + claude2_models:
             raise Exception(f"Must provide a Claude model, got {config.model}")
         system_message = next((m for m in messages if m.role == LLMMessageRole.system), None)
@@ -155,12 +225,19 @@ class ClaudeApi(BaseModel):
             "anthropic-version": self.version,
             "Content-Type": "application/json"
         }
-        response = requests.post(url, json=data, headers=headers, timeout=self.timeout)
-        data: Dict = response.json()
+        return url, data, headers
+
+    @staticmethod
+    def parse_response(data: Dict):
         if data.get("error", None) is not None:
             raise Exception(data.get("error").get("message"))
         return data["content"][0]["text"]
 
+    def chat(self, messages: List[LLMMessage], config: LLMConfig, seed=None, cache="off", stream=False, node_id=None):
+        url, data, headers = self.build_request(messages, config, seed)
+        data: Dict = post_chat_request("anthropic", self.api_key, url, data, headers, self.timeout, seed, cache, stream, node_id)
+        return self.parse_response(data)
+
     def complete(self, prompt: str, config: LLMConfig):
         messages = [LLMMessage.create(role=LLMMessageRole.user, text=prompt)]
         return self.chat(messages, config)
@@ -260,12 +337,24 @@ class AwsBedrockClaudeApi(BaseModel):
 
 LLMApi = Union[OpenAIApi, ClaudeApi, AwsBedrockMistralApi, AwsBedrockClaudeApi]
 
+def _first(value):
+    """Single value of an INPUT_IS_LIST input."""
+    return value[0] if isinstance(value, list) and value else value
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
 class LLMAIONode:
     TITLE = "LLM All-In-One"
     CATEGORY = "oshtz Nodes"
     RETURN_TYPES = ("STRING",)
     RETURN_NAMES = ("response",)
     FUNCTION = "process"
+    # A list of prompts (or a newline batch) is sent concurrently and answered as an ordered list
+    INPUT_IS_LIST = True
+    OUTPUT_IS_LIST = (True,)
 
     @classmethod
     def INPUT_TYPES(cls):
@@ -287,11 +376,26 @@ class LLMAIONode:
                 "openai_api_key": ("STRING", {"multiline": False}),
                 "anthropic_api_key": ("STRING", {"multiline": False}),
                 "image": ("IMAGE",),
-            }
+                "cache": (CACHE_MODES, {"default": "off"}),
+                "stream": ("BOOLEAN", {"default": False}),
+                "prompt_batch": (["off", "lines"], {"default": "off", "tooltip": "lines: send every non-empty line of the prompt as its own request"}),
+                "max_concurrency": ("INT", {"default": DEFAULT_BATCH_CONCURRENCY, "min": 1, "max": 64, "tooltip": "How many requests of a prompt batch run at once"}),
+                "provider_batch": ("BOOLEAN", {"default": False, "tooltip": "Send a prompt batch through the OpenAI Batch / Anthropic Message Batches API: cheaper, but results can take up to 24 hours"}),
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
+            },
         }
 
     def process(self, api_type, model, max_token, temperature, prompt, seed,
-                openai_api_key=None, anthropic_api_key=None, image: Optional[Tensor] = None):
+                openai_api_key=None, anthropic_api_key=None, image: Optional[List[Tensor]] = None, cache="off",
+                stream=False, unique_id=None, prompt_batch="off", max_concurrency=DEFAULT_BATCH_CONCURRENCY,
+                provider_batch=False):
+        # Every input arrives as a list (INPUT_IS_LIST); only prompt and image may hold several values
+        prompts, images = _as_list(prompt), _as_list(image)
+        api_type, model, max_token, temperature, seed = map(_first, (api_type, model, max_token, temperature, seed))
+        openai_api_key, anthropic_api_key, cache, stream, unique_id = map(_first, (openai_api_key, anthropic_api_key, cache, stream, unique_id))
+        prompt_batch, max_concurrency, provider_batch = map(_first, (prompt_batch, max_concurrency, provider_batch))
         config = LLMConfig(
             model=model,
             max_token=max_token,
@@ -309,18 +413,80 @@ class LLMAIONode:
         else:
             raise ValueError(f"Unsupported API type: {api_type}")
 
-        if image is not None:
-            pil = tensor2pil(image)
-            image_content = pil2base64(pil)
-            message = LLMMessage.create(role=LLMMessageRole.user, text=prompt, image=image_content)
-        else:
-            message = LLMMessage.create(role=LLMMessageRole.user, text=prompt)
+        # (prompt, image index) per request; one image goes with every prompt, a list of images pairs up by position
+        jobs = [(text, i if len(images) == len(prompts) else 0) for i, text in enumerate(prompts)]
+        if prompt_batch == "lines":
+            jobs = [(line.strip(), index) for text, index in jobs for line in text.splitlines() if line.strip()] or jobs
+        encoded_images = {}
 
-        if api_type == "openai":
-            response = api.chat([message], config, seed=seed)
-        else:
-            response = api.chat([message], config)
-        return (response,)
+        def message_for(text, index):
+            if not images:
+                return LLMMessage.create(role=LLMMessageRole.user, text=text)
+            if index not in encoded_images:
+                encoded_images[index] = pil2base64(tensor2pil(images[index]))
+            return LLMMessage.create(role=LLMMessageRole.user, text=text, image=encoded_images[index])
+
+        messages = [message_for(text, index) for text, index in jobs]
+        if provider_batch and len(messages) > 1:
+            return (self.provider_batch(api, messages, config, seed, cache),)
+        if len(messages) == 1:
+            response = api.chat(messages, config, seed=seed, cache=cache, stream=stream, node_id=unique_id)
+            if stream:
+                # Also covers responses that came from the cache or a coalesced request rather than a stream
+                publish_preview(unique_id, response)
+            return ([response],)
+        return (self.concurrent_batch(api, messages, config, seed, cache, max_concurrency),)
+
+    def concurrent_batch(self, api, messages, config, seed, cache, max_concurrency):
+        """Send one request per message, max_concurrency at a time (all paced by the shared scheduler); results in order."""
+        workers = max(1, min(max_concurrency, len(messages)))
+        print(f"{self.TITLE}: sending {len(messages)} prompts, up to {workers} at a time")
+        bar = progress_bar(len(messages))
+
+        def run(message):
+            with heartbeats_disabled():  # the batch progress bar counts finished prompts instead
+                return api.chat([message], config, seed=seed, cache=cache)
+
+        def on_result(i):
+            if bar is not None:
+                bar.update(1)
+
+        def on_error(i):
+            print(f"{self.TITLE}: prompt {i + 1} of {len(messages)} failed")
+
+        return map_interruptible(run, messages, workers, "oshtz-llm", on_result=on_result, on_error=on_error)
+
+    def provider_batch(self, api, messages, config, seed, cache):
+        """Answer the messages through the provider's batch API, submitting only those not already cached."""
+        requests = [api.build_request([message], config, seed) for message in messages]
+        cache_keys = [llm_response_cache.key(api.provider, url, data, seed) for url, data, _ in requests]
+        bodies = [llm_response_cache.get(key) if cache in ("read", "readwrite") else None for key in cache_keys]
+        missing = [i for i, body in enumerate(bodies) if body is None]
+        if missing:
+            print(f"{self.TITLE}: submitting {len(missing)} of {len(messages)} prompts to the {api.provider} batch API")
+            for i, body in zip(missing, run_provider_batch(api, [requests[i] for i in missing])):
+                bodies[i] = body
+                if cache in ("write", "readwrite") and body.get("error") is None:
+                    llm_response_cache.put(cache_keys[i], body)
+        responses = []
+        for i, body in enumerate(bodies):
+            try:
+                responses.append(api.parse_response(body))
+            except Exception as e:
+                raise Exception(f"Prompt {i + 1} of {len(messages)} failed in the batch: {e}") from e
+        return responses
+
+if server is not None:
+    @server.PromptServer.instance.routes.get("/oshtz-nodes/api-stats")
+    async def api_stats_endpoint(request):
+        """Report request, retry, throttling and coalescing counters of the API nodes."""
+        return web.json_response({
+            "scheduler": api_scheduler.stats(),
+            "transport": {"async": api_transport.stats(), "pooled": http_transport.stats()},
+            "coalesced": single_flight_stats(),
+            "llm_cache": llm_response_cache.stats(),
+            "llm_streams": stream_stats(),
+        })
 
 NODE_CLASS_MAPPINGS = {
     "LLMAIONode": LLMAIONode
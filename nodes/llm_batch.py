@@ -0,0 +1,172 @@
+import io
+import json
+import time
+
+from ..utils import env_int
+from .api_scheduler import api_scheduler
+from .async_transport import POLL_SECONDS, heartbeats_disabled, processing_interrupted, progress_bar, raise_if_interrupted
+from .http_transport import http_transport
+
+# Seconds between status checks of a submitted batch, overridable with OSHTZ_LLM_BATCH_POLL_SECONDS
+DEFAULT_POLL_SECONDS = 30
+FINISHED_OPENAI_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def run_provider_batch(api, requests):
+    """
+    Send chat requests through the provider's asynchronous batch API (OpenAI
+    Batch or Anthropic Message Batches) and wait for them to finish.
+
+    requests are (url, data, headers) tuples from api.build_request. Returns
+    the response bodies in request order, in the regular non-streaming shape;
+    requests that failed inside the batch get an {"error": ...} body. The
+    batch is cancelled if the prompt is interrupted while waiting.
+    """
+    poll_seconds = max(1, env_int("OSHTZ_LLM_BATCH_POLL_SECONDS", DEFAULT_POLL_SECONDS))
+    with heartbeats_disabled():  # the batch reports its own progress
+        if api.provider == "openai":
+            results = _openai_batch(api, requests, poll_seconds)
+        else:
+            results = _anthropic_batch(api, requests, poll_seconds)
+    return [results.get(_custom_id(i), {"error": {"message": "no result returned by the batch"}}) for i in range(len(requests))]
+
+
+def _custom_id(index):
+    return f"request-{index}"
+
+
+def _checked_json(response, what):
+    if not response.ok:
+        raise Exception(f"{what} failed with HTTP {response.status_code}: {response.text}")
+    return response.json()
+
+
+def _openai_batch(api, requests, poll_seconds):
+    base, key = api.endpoint, api.api_key
+    auth = {"Authorization": f"Bearer {key}"}
+    lines = [
+        json.dumps({"custom_id": _custom_id(i), "method": "POST", "url": "/v1/chat/completions", "body": data})
+        for i, (_, data, _) in enumerate(requests)
+    ]
+    upload = _checked_json(api_scheduler.post(
+        "openai", key, f"{base}/files", headers=auth, data={"purpose": "batch"},
+        files={"file": ("batch.jsonl", io.BytesIO("\n".join(lines).encode()), "application/jsonl")}, timeout=api.timeout,
+    ), "Uploading the OpenAI batch file")
+    batch = _checked_json(api_scheduler.post(
+        "openai", key, f"{base}/batches", headers=auth, timeout=api.timeout,
+        json={"input_file_id": upload["id"], "endpoint": "/v1/chat/completions", "completion_window": "24h"},
+    ), "Creating the OpenAI batch")
+    batch_url = f"{base}/batches/{batch['id']}"
+
+    def counts(status):
+        request_counts = status.get("request_counts") or {}
+        return request_counts.get("completed", 0) + request_counts.get("failed", 0), len(requests)
+
+    batch = _wait_for_batch(
+        batch["id"],
+        poll=lambda: _checked_json(api_scheduler.request("openai", key, "GET", batch_url, headers=auth, timeout=api.timeout), "Polling the OpenAI batch"),
+        finished=lambda status: status.get("status") in FINISHED_OPENAI_STATUSES,
+        describe=lambda status: status.get("status"),
+        counts=counts,
+        cancel=lambda: http_transport.post(f"{batch_url}/cancel", headers=auth, timeout=api.timeout),
+        poll_seconds=poll_seconds,
+    )
+
+    results = {}
+    for file_id in (batch.get("output_file_id"), batch.get("error_file_id")):
+        if not file_id:
+            continue
+        response = api_scheduler.request("openai", key, "GET", f"{base}/files/{file_id}/content", headers=auth, timeout=api.timeout)
+        if not response.ok:
+            raise Exception(f"Downloading OpenAI batch results failed with HTTP {response.status_code}: {response.text}")
+        for line in response.text.splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("error"):
+                results[entry["custom_id"]] = {"error": entry["error"]}
+            else:
+                results[entry["custom_id"]] = entry["response"]["body"]
+    if not results and batch.get("status") != "completed":
+        errors = (batch.get("errors") or {}).get("data") or []
+        detail = "; ".join(error.get("message", "") for error in errors)
+        raise Exception(f"OpenAI batch {batch['id']} {batch.get('status')}{': ' + detail if detail else ''}")
+    return results
+
+
+def _anthropic_batch(api, requests, poll_seconds):
+    base, key = api.endpoint, api.api_key
+    headers = requests[0][2]
+    batch = _checked_json(api_scheduler.post(
+        "anthropic", key, f"{base}/messages/batches", headers=headers, timeout=api.timeout,
+        json={"requests": [{"custom_id": _custom_id(i), "params": data} for i, (_, data, _) in enumerate(requests)]},
+    ), "Creating the Anthropic message batch")
+    batch_url = f"{base}/messages/batches/{batch['id']}"
+
+    def counts(status):
+        request_counts = status.get("request_counts") or {}
+        done = sum(request_counts.get(state, 0) for state in ("succeeded", "errored", "canceled", "expired"))
+        return done, len(requests)
+
+    batch = _wait_for_batch(
+        batch["id"],
+        poll=lambda: _checked_json(api_scheduler.request("anthropic", key, "GET", batch_url, headers=headers, timeout=api.timeout), "Polling the Anthropic message batch"),
+        finished=lambda status: status.get("processing_status") == "ended",
+        describe=lambda status: status.get("processing_status"),
+        counts=counts,
+        cancel=lambda: http_transport.post(f"{batch_url}/cancel", headers=headers, timeout=api.timeout),
+        poll_seconds=poll_seconds,
+    )
+
+    response = api_scheduler.request("anthropic", key, "GET", batch["results_url"], headers=headers, timeout=api.timeout)
+    if not response.ok:
+        raise Exception(f"Downloading Anthropic batch results failed with HTTP {response.status_code}: {response.text}")
+    results = {}
+    for line in response.text.splitlines():
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        result = entry.get("result") or {}
+        if result.get("type") == "succeeded":
+            results[entry["custom_id"]] = result["message"]
+        elif result.get("type") == "errored":
+            error = result.get("error") or {}
+            results[entry["custom_id"]] = {"error": error.get("error", error)}
+        else:
+            results[entry["custom_id"]] = {"error": {"message": f"request {result.get('type', 'failed')} in the batch"}}
+    return results
+
+
+def _wait_for_batch(batch_id, poll, finished, describe, counts, cancel, poll_seconds):
+    """
+    Poll a batch until finished(status), showing progress. If waiting ends any
+    other way (interrupt, a failed poll), the batch is cancelled before the
+    error is raised, so it doesn't keep running and billing.
+    """
+    bar = progress_bar(100)
+    last_state = None
+    try:
+        while True:
+            status = poll()
+            done, total = counts(status)
+            state = (describe(status), done)
+            if state != last_state:
+                print(f"[oshtz-nodes] LLM batch {batch_id}: {state[0]}, {done}/{total} requests done")
+                last_state = state
+            if bar is not None and total:
+                bar.update_absolute(min(99, done * 100 // total))
+            if finished(status):
+                return status
+            deadline = time.monotonic() + poll_seconds
+            while time.monotonic() < deadline:
+                raise_if_interrupted()
+                time.sleep(POLL_SECONDS)
+    except BaseException as e:
+        reason = "interrupted" if processing_interrupted() else f"waiting failed ({e})"
+        print(f"[oshtz-nodes] LLM batch {batch_id}: {reason}, cancelling")
+        # Sent directly rather than through the scheduler, whose waits would stop at the interrupt flag
+        try:
+            cancel()
+        except Exception as cancel_error:
+            print(f"[oshtz-nodes] LLM batch {batch_id}: cancel failed: {cancel_error}")
+        raise
@@ -0,0 +1,80 @@
+import collections
+import json
+import threading
+import time
+
+from ..utils import env_int
+from .disk_cache import DiskCache, content_key
+
+CACHE_MODES = ["off", "read", "write", "readwrite"]
+# Overridable with OSHTZ_LLM_CACHE_MEMORY_ENTRIES, OSHTZ_LLM_CACHE_MB and OSHTZ_LLM_CACHE_TTL_HOURS (0 = never)
+DEFAULT_MEMORY_ENTRIES = 256
+DEFAULT_CACHE_MB = 64
+DEFAULT_CACHE_TTL_HOURS = 0
+
+
+class ResponseCache:
+    """
+    LLM response cache: an in-memory LRU of recent responses in front of a
+    DiskCache, both honouring the same TTL. Responses are stored as their JSON
+    bodies, keyed by the full request payload plus the node seed.
+    """
+
+    def __init__(self, name, memory_entries, max_bytes, ttl_seconds=0):
+        self.memory_entries = memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk = DiskCache(name, max_bytes, ttl_seconds)
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+
+    @staticmethod
+    def key(provider, url, data, seed):
+        # data holds model, messages (images included as base64), max_tokens and temperature
+        return content_key(provider, url, json.dumps(data, sort_keys=True), seed)
+
+    def get(self, key):
+        """Return the cached response body as a dict, or None."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, payload = entry
+                if self.ttl_seconds > 0 and time.time() - created > self.ttl_seconds:
+                    del self._memory[key]
+                else:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return json.loads(payload)
+        entry = self.disk.get_entry(key)
+        if entry is None:
+            return None
+        created, payload = entry
+        self._remember(key, payload, created)
+        return json.loads(payload)
+
+    def put(self, key, response):
+        payload = json.dumps(response).encode()
+        self._remember(key, payload, time.time())
+        self.disk.put(key, payload)
+
+    def stats(self):
+        with self._lock:
+            memory = {"entries": len(self._memory), "max_entries": self.memory_entries, "hits": self.memory_hits}
+        return {"memory": memory, "disk": self.disk.stats()}
+
+    def _remember(self, key, payload, created):
+        if self.memory_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = (created, payload)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+
+llm_response_cache = ResponseCache(
+    "llm",
+    env_int("OSHTZ_LLM_CACHE_MEMORY_ENTRIES", DEFAULT_MEMORY_ENTRIES),
+    env_int("OSHTZ_LLM_CACHE_MB", DEFAULT_CACHE_MB) * 1024 * 1024,
+    env_int("OSHTZ_LLM_CACHE_TTL_HOURS", DEFAULT_CACHE_TTL_HOURS) * 3600,
+)
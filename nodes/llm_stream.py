@@ -0,0 +1,158 @@
+import json
+import threading
+import time
+from collections import deque
+
+from .async_transport import processing_interrupted, raise_if_interrupted
+
+try:
+    import server
+except ImportError:  # running outside ComfyUI
+    server = None
+
+PREVIEW_EVENT = "oshtz-nodes.llm-stream"
+# Deltas are batched into one preview message at most this often
+PREVIEW_INTERVAL_SECONDS = 0.05
+RECENT_STREAMS = 64
+
+# Extra request fields that switch each provider to server-sent events
+STREAM_FIELDS = {
+    "openai": {"stream": True, "stream_options": {"include_usage": True}},
+    "anthropic": {"stream": True},
+}
+
+_recent = deque(maxlen=RECENT_STREAMS)
+_recent_lock = threading.Lock()
+
+
+class ChatStream:
+    """
+    Consumes a chat completion streamed as server-sent events.
+
+    Feed it the response body line by line (on_line). Text deltas are
+    collected, pushed to the node's preview widget, and the response is
+    rebuilt in the provider's non-streaming shape by result(), so callers parse
+    it exactly like a regular response. Time to first token and tokens per
+    second are recorded for every stream.
+    """
+
+    def __init__(self, provider, model, node_id=None):
+        self.provider = provider
+        self.model = model
+        self.node_id = node_id
+        self.parts = []
+        self.error = None
+        self.usage = {}
+        self.deltas = 0
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        self._unsent = []
+        self._last_sent = 0.0
+        self._preview_started = False
+
+    def on_line(self, line):
+        if processing_interrupted():
+            raise_if_interrupted()
+        if not line.startswith(b"data:"):
+            return  # event names, comments and keep-alive blank lines
+        payload = line[5:].strip()
+        if not payload or payload == b"[DONE]":
+            return
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            return
+        if event.get("error") is not None:
+            self.error = event["error"]
+            return
+        text = self._openai_event(event) if self.provider == "openai" else self._anthropic_event(event)
+        if text:
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+            self.deltas += 1
+            self.parts.append(text)
+            self._unsent.append(text)
+            if time.perf_counter() - self._last_sent >= PREVIEW_INTERVAL_SECONDS:
+                self._send_preview()
+
+    def result(self):
+        """The streamed response in the provider's non-streaming JSON shape."""
+        self._send_preview(done=True)
+        self._record()
+        if self.error is not None:
+            return {"error": self.error}
+        text = "".join(self.parts)
+        if self.provider == "openai":
+            return {"choices": [{"message": {"role": "assistant", "content": text}}], "usage": self.usage}
+        return {"content": [{"type": "text", "text": text}], "usage": self.usage}
+
+    def _openai_event(self, event):
+        if event.get("usage"):
+            self.usage = event["usage"]
+        choices = event.get("choices") or []
+        return (choices[0].get("delta") or {}).get("content") if choices else None
+
+    def _anthropic_event(self, event):
+        kind = event.get("type")
+        if kind == "message_start":
+            self.usage.update(event.get("message", {}).get("usage", {}))
+        elif kind == "message_delta":
+            self.usage.update(event.get("usage", {}))
+        elif kind == "content_block_delta":
+            return event.get("delta", {}).get("text")
+        return None
+
+    def _send_preview(self, done=False):
+        if server is None or self.node_id is None or (not self._unsent and not done):
+            return
+        instance = server.PromptServer.instance
+        instance.send_sync(PREVIEW_EVENT, {
+            "node": self.node_id,
+            "delta": "".join(self._unsent),
+            "start": not self._preview_started,
+            "done": done,
+        }, instance.client_id)
+        self._preview_started = True
+        self._unsent = []
+        self._last_sent = time.perf_counter()
+
+    def _record(self):
+        end = time.perf_counter()
+        tokens = self.usage.get("completion_tokens") or self.usage.get("output_tokens") or self.deltas
+        ttft = (self.first_token_at - self.start) if self.first_token_at is not None else None
+        generating = end - (self.first_token_at if self.first_token_at is not None else self.start)
+        timing = {
+            "provider": self.provider,
+            "model": self.model,
+            "ttft_ms": ttft * 1000 if ttft is not None else None,
+            "tokens": tokens,
+            "tokens_per_second": tokens / generating if generating > 0 else None,
+            "total_ms": (end - self.start) * 1000,
+        }
+        with _recent_lock:
+            _recent.append(timing)
+        if ttft is not None:
+            print(f"[oshtz-nodes] LLM: {self.model} first token after {timing['ttft_ms']:.0f} ms, "
+                  f"{tokens} tokens at {timing['tokens_per_second'] or 0:.1f} tokens/s")
+
+
+def publish_preview(node_id, text):
+    """Show a complete response (e.g. from the cache) in the node's preview widget."""
+    if server is None or node_id is None:
+        return
+    instance = server.PromptServer.instance
+    instance.send_sync(PREVIEW_EVENT, {"node": node_id, "text": text, "done": True}, instance.client_id)
+
+
+def stream_stats():
+    with _recent_lock:
+        recent = list(_recent)
+    stats = {"streams": len(recent)}
+    ttfts = [t["ttft_ms"] for t in recent if t["ttft_ms"] is not None]
+    rates = [t["tokens_per_second"] for t in recent if t["tokens_per_second"] is not None]
+    if ttfts:
+        stats["avg_ttft_ms"] = sum(ttfts) / len(ttfts)
+    if rates:
+        stats["avg_tokens_per_second"] = sum(rates) / len(rates)
+    stats["recent"] = recent[-8:]
+    return stats
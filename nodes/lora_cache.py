@@ -0,0 +1,297 @@
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import folder_paths
+
+from ..utils import env_int
+from .lora_keymap import load_lora_for_models
+from .lora_mmap import load_lora_file
+from .lora_precision import compact_state_dict, storage_dtype_from_env
+
+# RAM budget for cached LoRA tensors, overridable with OSHTZ_LORA_CACHE_MB (0 disables caching)
+DEFAULT_BUDGET_MB = 4096
+# How long a stat() result is reused when fingerprinting LoRA files for IS_CHANGED
+STAT_TTL_SECONDS = 2.0
+# Number of patched (MODEL, CLIP) pairs memoized by the dynamic switcher, overridable with OSHTZ_LORA_VARIANTS
+DEFAULT_MAX_VARIANTS = 8
+
+
+def file_fingerprint(path):
+    """Return the (resolved path, mtime, size) tuple identifying a LoRA file on disk."""
+    real_path = os.path.realpath(path)
+    st = os.stat(real_path)
+    return (real_path, st.st_mtime_ns, st.st_size)
+
+
+def resolve_lora_path(lora_name):
+    lora_path = folder_paths.get_full_path("loras", lora_name)
+    if lora_path is None and ('/' in lora_name or '\\' in lora_name):
+        # Same fallback LoraSwitcherDynamic uses for names saved with a directory part
+        lora_path = folder_paths.get_full_path("loras", folder_paths.get_path_filename(lora_name))
+    return lora_path
+
+
+class StatTable:
+    """Short-lived memo of file fingerprints, so repeated IS_CHANGED checks don't re-stat network storage."""
+
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}  # path -> (checked_at, fingerprint or None)
+        self._lock = threading.Lock()
+
+    def fingerprint(self, path):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and now - entry[0] < self.ttl_seconds:
+                return entry[1]
+        try:
+            fingerprint = file_fingerprint(path)
+        except OSError:
+            fingerprint = None
+        with self._lock:
+            self._entries[path] = (now, fingerprint)
+        return fingerprint
+
+
+stat_table = StatTable(STAT_TTL_SECONDS)
+
+
+def lora_change_key(lora_name, strength_model, strength_clip):
+    """
+    IS_CHANGED value for a switcher that applies lora_name: changes when the
+    selection, strengths, or the file on disk (mtime/size) change.
+    """
+    if not lora_name or lora_name == "None" or (strength_model == 0 and strength_clip == 0):
+        return "bypass"
+    lora_path = resolve_lora_path(lora_name)
+    fingerprint = stat_table.fingerprint(lora_path) if lora_path else None
+    if fingerprint is None:
+        return f"{lora_name}|missing"
+    real_path, mtime_ns, size = fingerprint
+    return f"{lora_name}|{strength_model}|{strength_clip}|{real_path}|{mtime_ns}|{size}"
+
+
+def state_dict_nbytes(state_dict):
+    return sum(t.nbytes for t in state_dict.values() if hasattr(t, "nbytes"))
+
+
+class LoraCache:
+    """
+    Process-wide LRU cache of LoRA state dicts shared by all switcher nodes.
+
+    Entries are keyed by file fingerprint, so a file replaced on disk is
+    reloaded instead of served stale. The cache is bounded by a byte budget
+    and evicts the least recently used LoRAs first. Tensors can be stored in
+    reduced precision (storage: fp16, bf16 or int8) and are handed out as
+    stored: ComfyUI's patch code upcasts fp16/bf16, and int8 tensors are
+    expanded one weight at a time while patching (see bind_int8_patches).
+    """
+
+    def __init__(self, budget_bytes, storage="native"):
+        self.budget_bytes = budget_bytes
+        self.storage = storage
+        self._entries = OrderedDict()  # fingerprint -> (state_dict, nbytes)
+        self._loading = {}  # fingerprint -> Event set once an in-flight load finishes
+        self._lock = threading.RLock()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def set_budget(self, budget_bytes):
+        with self._lock:
+            self.budget_bytes = budget_bytes
+            self._evict_to(self.budget_bytes)
+
+    def get(self, lora_path):
+        """Return the state dict for lora_path, loading it from disk on a miss."""
+        key = file_fingerprint(lora_path)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    break
+                loading = self._loading.get(key)
+                if loading is None:
+                    self._loading[key] = threading.Event()
+                    self.misses += 1
+                    break
+            # Another thread (usually the prefetcher) is already reading this file
+            loading.wait()
+
+        if entry is not None:
+            return entry[0]
+        try:
+            state_dict = compact_state_dict(load_lora_file(key[0]), self.storage)
+            self.put(key, state_dict)
+        finally:
+            with self._lock:
+                self._loading.pop(key).set()
+        return state_dict
+
+    def contains(self, lora_path):
+        key = file_fingerprint(lora_path)
+        with self._lock:
+            return key in self._entries or key in self._loading
+
+    def put(self, key, state_dict):
+        nbytes = state_dict_nbytes(state_dict)
+        with self._lock:
+            # A newer version of the same file supersedes any older entry
+            for old_key in [k for k in self._entries if k[0] == key[0] and k != key]:
+                self._drop(old_key)
+            if key in self._entries or nbytes > self.budget_bytes:
+                return
+            self._evict_to(self.budget_bytes - nbytes)
+            self._entries[key] = (state_dict, nbytes)
+            self.bytes_used += nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes_used = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes_used": self.bytes_used,
+                "budget_bytes": self.budget_bytes,
+                "storage": self.storage,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _evict_to(self, limit):
+        while self._entries and self.bytes_used > limit:
+            key = next(iter(self._entries))
+            self._drop(key)
+            self.evictions += 1
+
+    def _drop(self, key):
+        _, nbytes = self._entries.pop(key)
+        self.bytes_used -= nbytes
+
+
+# Attribute holding a base model's memoized variants
+_VARIANTS_ATTR = "_oshtz_lora_variants"
+
+
+class PatchedVariantCache:
+    """
+    Bounded LRU memo of patched (MODEL, CLIP) pairs.
+
+    Each base model carries the memo of its own variants as an attribute.
+    Variants reference their base through ModelPatcher.parent, so base and
+    memo only form a reference cycle and are collected together once ComfyUI
+    drops the base. The global LRU order, which bounds the total number of
+    variants, holds bases only weakly; variants of a clip that goes away are
+    dropped as well.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._order = OrderedDict()  # (id(model), id(clip), *variant_key) -> weakref to model
+        self._watched = {}  # id(base) -> weakref to base (model or clip)
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_create(self, model, clip, variant_key, create):
+        """Return the memoized variant for (model, clip, variant_key), calling create() on a miss."""
+        memo_key = (id(clip),) + tuple(variant_key)
+        with self._lock:
+            entry = getattr(model, _VARIANTS_ATTR, {}).get(memo_key)
+            if entry is not None:
+                self._order.move_to_end((id(model),) + memo_key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        variant = create()
+        if self.max_entries <= 0:
+            return variant
+        with self._lock:
+            if not (self._watch(model) and self._watch(clip)):
+                return variant
+            memo = getattr(model, _VARIANTS_ATTR, None)
+            if memo is None:
+                try:
+                    memo = {}
+                    setattr(model, _VARIANTS_ATTR, memo)
+                except AttributeError:
+                    return variant
+            memo[memo_key] = variant
+            order_key = (id(model),) + memo_key
+            self._order[order_key] = self._watched[id(model)]
+            self._order.move_to_end(order_key)
+            while len(self._order) > self.max_entries:
+                self._drop(*self._order.popitem(last=False))
+                self.evictions += 1
+        return variant
+
+    def clear(self):
+        with self._lock:
+            while self._order:
+                self._drop(*self._order.popitem(last=False))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._order),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    @staticmethod
+    def _drop(order_key, model_ref):
+        model = model_ref()
+        if model is not None:
+            getattr(model, _VARIANTS_ATTR, {}).pop(order_key[1:], None)
+
+    def _watch(self, base):
+        if base is None:
+            return True
+        base_id = id(base)
+        if base_id in self._watched:
+            return True
+        try:
+            self._watched[base_id] = weakref.ref(base, lambda _ref, base_id=base_id: self._forget(base_id))
+        except TypeError:
+            return False
+        return True
+
+    def _forget(self, base_id):
+        with self._lock:
+            self._watched.pop(base_id, None)
+            for key in [k for k in self._order if base_id in (k[0], k[1])]:
+                self._drop(key, self._order.pop(key))
+                self.evictions += 1
+
+
+lora_cache = LoraCache(env_int("OSHTZ_LORA_CACHE_MB", DEFAULT_BUDGET_MB) * 1024 * 1024, storage_dtype_from_env())
+patched_variants = PatchedVariantCache(env_int("OSHTZ_LORA_VARIANTS", DEFAULT_MAX_VARIANTS))
+
+
+def load_lora(model, clip, lora_name, strength_model, strength_clip):
+    """Drop-in replacement for LoraLoader().load_lora backed by the shared LoRA cache."""
+    if strength_model == 0 and strength_clip == 0:
+        return (model, clip)
+
+    lora_path = folder_paths.get_full_path("loras", lora_name)
+    if lora_path is None:
+        raise FileNotFoundError(f"LoRA file not found: {lora_name}")
+
+    lora = lora_cache.get(lora_path)
+    model_lora, clip_lora = load_lora_for_models(model, clip, lora, strength_model, strength_clip)
+    return (model_lora, clip_lora)
@@ -0,0 +1,370 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter, deque
+
+import folder_paths
+
+from ..utils import env_int
+from .lora_mmap import read_safetensors_header
+
+# Seconds between directory polls, overridable with OSHTZ_LORA_CATALOG_POLL (0 scans only once at startup)
+DEFAULT_POLL_SECONDS = 30
+# How many of the most frequent training tags are kept as trigger words
+MAX_TRIGGER_WORDS = 10
+# Name-set changes remembered for since=<version> delta requests
+MAX_CHANGE_LOG = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS loras (
+    name TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT,
+    base_model TEXT,
+    rank INTEGER,
+    trigger_words TEXT,
+    metadata TEXT
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _catalog_path():
+    try:
+        base_dir = folder_paths.get_user_directory()
+    except AttributeError:
+        base_dir = os.path.join(os.path.dirname(__file__), "..")
+    return os.path.join(base_dir, "oshtz-nodes", "lora_catalog.sqlite")
+
+
+def _sha256(path, chunk_size=4 * 1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def parse_lora_metadata(path):
+    """Return (base model, rank, trigger words, raw metadata) parsed from a LoRA file header."""
+    if not path.lower().endswith(".safetensors"):
+        return None, None, [], {}
+    try:
+        header, _ = read_safetensors_header(path)
+    except Exception as e:
+        print(f"[oshtz-nodes] Could not read safetensors header of '{path}': {e}")
+        return None, None, [], {}
+
+    metadata = header.get("__metadata__") or {}
+    base_model = metadata.get("ss_base_model_version") or metadata.get("modelspec.architecture")
+
+    rank = None
+    try:
+        rank = int(metadata["ss_network_dim"])
+    except (KeyError, ValueError, TypeError):
+        for key, info in header.items():
+            if key.endswith(("lora_down.weight", "lora_A.weight")) and info.get("shape"):
+                rank = int(info["shape"][0])
+                break
+
+    trigger_words = []
+    if metadata.get("modelspec.trigger_phrase"):
+        trigger_words = [w.strip() for w in metadata["modelspec.trigger_phrase"].split(",") if w.strip()]
+    elif metadata.get("ss_tag_frequency"):
+        try:
+            tags = Counter()
+            for dataset_tags in json.loads(metadata["ss_tag_frequency"]).values():
+                tags.update({tag.strip(): count for tag, count in dataset_tags.items()})
+            trigger_words = [tag for tag, _ in tags.most_common(MAX_TRIGGER_WORDS) if tag]
+        except (ValueError, AttributeError):
+            pass
+    return base_model, rank, trigger_words, metadata
+
+
+class LoraCatalog:
+    """
+    Persistent index of the LoRA folders, kept current by a polling watcher thread.
+
+    Listing and searching are served from memory and SQLite instead of walking
+    the LoRA directories on every request. The index survives restarts, so the
+    list is available immediately while the first rescan runs in the background.
+    """
+
+    def __init__(self, db_path, poll_seconds):
+        self.db_path = db_path
+        self.poll_seconds = poll_seconds
+        self._conn = None
+        self._lock = threading.RLock()
+        self._names = []
+        self._name_set = None
+        self._ready = False
+        self._thread = None
+        self._wake = threading.Event()
+        self._changes = deque(maxlen=MAX_CHANGE_LOG)  # (version, added, removed)
+        self._listeners = []
+        self.version = 0
+
+    def add_listener(self, callback):
+        """Call callback(version, previous_version, added, removed) whenever the set of names changes."""
+        self._listeners.append(callback)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            try:
+                self._open()
+            except Exception as e:
+                print(f"[oshtz-nodes] LoRA catalog unavailable, falling back to directory scans: {e}")
+                self._thread = False
+                return
+            self._thread = threading.Thread(target=self._watch, name="oshtz-lora-catalog", daemon=True)
+            self._thread.start()
+
+    def refresh(self):
+        """Ask the watcher to rescan now instead of waiting for the next poll."""
+        self.start()
+        self._wake.set()
+
+    def names(self):
+        """Return the sorted LoRA names, or None until the catalog has been populated."""
+        self.start()
+        with self._lock:
+            return list(self._names) if self._ready else None
+
+    def name_set(self):
+        """Return a frozenset of LoRA names for O(1) membership checks, or None until populated."""
+        self.start()
+        with self._lock:
+            if not self._ready:
+                return None
+            if self._name_set is None:
+                self._name_set = frozenset(self._names)
+            return self._name_set
+
+    def snapshot(self):
+        """Return (version, names), or (None, None) until the catalog has been populated."""
+        self.start()
+        with self._lock:
+            return (self.version, list(self._names)) if self._ready else (None, None)
+
+    def changes_since(self, version):
+        """
+        Return (current version, added, removed) relative to version, or None if
+        the change log doesn't reach back that far and the full list is needed.
+        """
+        with self._lock:
+            if version == self.version:
+                return self.version, [], []
+            if not self._changes or version < self._changes[0][0] - 1 or version > self.version:
+                return None
+            added, removed = set(), set()
+            for change_version, change_added, change_removed in self._changes:
+                if change_version <= version:
+                    continue
+                for name in change_added:
+                    if name in removed:
+                        removed.discard(name)
+                    else:
+                        added.add(name)
+                for name in change_removed:
+                    if name in added:
+                        added.discard(name)
+                    else:
+                        removed.add(name)
+            return self.version, sorted(added), sorted(removed)
+
+    def search(self, query="", prefix="", offset=0, limit=100):
+        """Return (total, rows) of catalog entries matching query and prefix, ordered by name."""
+        self.start()
+        clauses, params = [], []
+        if prefix:
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            params.append(_escape_like(prefix) + "%")
+        if query:
+            clauses.append("(name LIKE ? ESCAPE '\\' OR trigger_words LIKE ? ESCAPE '\\' OR base_model LIKE ? ESCAPE '\\')")
+            params += ["%" + _escape_like(query) + "%"] * 3
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            if not self._conn:
+                return 0, []
+            total = self._conn.execute(f"SELECT COUNT(*) FROM loras {where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT name, size, mtime_ns, sha256, base_model, rank, trigger_words FROM loras {where} "
+                "ORDER BY name LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+        return total, [
+            {
+                "name": name,
+                "size": size,
+                "mtime": mtime_ns / 1e9,
+                "sha256": sha256,
+                "base_model": base_model,
+                "rank": rank,
+                "trigger_words": json.loads(trigger_words or "[]"),
+            }
+            for name, size, mtime_ns, sha256, base_model, rank, trigger_words in rows
+        ]
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        self.version = int(row[0]) if row else 0
+        names = [row[0] for row in self._conn.execute("SELECT name FROM loras ORDER BY name")]
+        if names:
+            self._names = names
+            self._ready = True
+
+    def _watch(self):
+        while True:
+            try:
+                self._scan()
+                self._hash_pending()
+            except Exception as e:
+                print(f"[oshtz-nodes] LoRA catalog scan failed: {e}")
+            if self.poll_seconds <= 0:
+                self._wake.wait()
+            else:
+                self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+
+    def _scan(self):
+        found = {}
+        extensions = folder_paths.supported_pt_extensions
+        for directory in folder_paths.get_folder_paths("loras"):
+            if not os.path.isdir(directory):
+                continue
+            for dirpath, _, filenames in os.walk(directory, followlinks=True):
+                for filename in filenames:
+                    if os.path.splitext(filename)[1].lower() not in extensions:
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(path, directory)
+                    if name in found:
+                        continue
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    found[name] = (path, st.st_size, st.st_mtime_ns)
+
+        with self._lock:
+            known = {name: (path, size, mtime_ns) for name, path, size, mtime_ns
+                     in self._conn.execute("SELECT name, path, size, mtime_ns FROM loras")}
+        changed = [name for name, entry in found.items() if known.get(name) != entry]
+        removed = [name for name in known if name not in found]
+
+        for name in changed:
+            path, size, mtime_ns = found[name]
+            base_model, rank, trigger_words, metadata = parse_lora_metadata(path)
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO loras (name, path, size, mtime_ns, sha256, base_model, rank, trigger_words, metadata) "
+                    "VALUES (?, ?, ?, ?, NULL, ?, ?, ?, ?)",
+                    (name, path, size, mtime_ns, base_model, rank, json.dumps(trigger_words), json.dumps(metadata)),
+                )
+        added = sorted(name for name in changed if name not in known)
+        with self._lock:
+            self._conn.executemany("DELETE FROM loras WHERE name = ?", [(name,) for name in removed])
+            previous_version = self.version
+            if added or removed:
+                self.version += 1
+                self._changes.append((self.version, added, sorted(removed)))
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (str(self.version),))
+            self._conn.commit()
+            self._names = sorted(found)
+            self._name_set = None
+            self._ready = True
+        if changed or removed:
+            print(f"[oshtz-nodes] LoRA catalog updated: {len(changed)} added/changed, {len(removed)} removed")
+        if added or removed:
+            for callback in self._listeners:
+                try:
+                    callback(self.version, previous_version, added, sorted(removed))
+                except Exception as e:
+                    print(f"[oshtz-nodes] LoRA catalog listener failed: {e}")
+
+    def _hash_pending(self):
+        # Content hashes are slow on network storage, so they're filled in after the listing is usable
+        with self._lock:
+            pending = self._conn.execute("SELECT name, path, size, mtime_ns FROM loras WHERE sha256 IS NULL").fetchall()
+        for name, path, size, mtime_ns in pending:
+            if self._wake.is_set():
+                return
+            try:
+                sha256 = _sha256(path)
+            except OSError:
+                continue
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE loras SET sha256 = ? WHERE name = ? AND size = ? AND mtime_ns = ?",
+                    (sha256, name, size, mtime_ns),
+                )
+                self._conn.commit()
+
+
+def _escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+lora_catalog = LoraCatalog(_catalog_path(), env_int("OSHTZ_LORA_CATALOG_POLL", DEFAULT_POLL_SECONDS))
+
+
+def get_lora_names():
+    """LoRA names for combo inputs, served from the catalog once it is populated."""
+    names = lora_catalog.names()
+    if names is None:
+        names = folder_paths.get_filename_list("loras")
+    return names
+
+
+def lora_combo_input():
+    """
+    LoRA combo input whose options the frontend fetches once from the catalog
+    endpoint, instead of embedding the whole list in /object_info per slot.
+    """
+    return ("COMBO", {
+        "remote": {"route": "/oshtz-nodes/get-loras", "refresh_button": True},
+        "default": "None",
+    })
+
+
+def validate_lora_selection(slot_count, lora_strength, selected, loras, apply_mode=None, apply_modes=(), strength_range=(-10.0, 10.0)):
+    """
+    VALIDATE_INPUTS body for the fixed-slot switchers.
+
+    Remote combos carry no option list, so the LoRA names are checked here
+    against the catalog's name set (O(1) per slot) instead of by ComfyUI's
+    linear membership scan. Taking **loras opts every input out of ComfyUI's
+    own checks, so the other widgets are checked here too. Linked inputs
+    arrive as None and are left to the node at execution time.
+    """
+    if isinstance(lora_strength, (int, float)) and not strength_range[0] <= lora_strength <= strength_range[1]:
+        return f"lora_strength {lora_strength} is outside {strength_range[0]}..{strength_range[1]}"
+    if selected is not None and selected != "None" and selected not in {f"LoRA {i}" for i in range(1, slot_count + 1)}:
+        return f"Invalid selection '{selected}'"
+    if apply_mode is not None and apply_mode not in apply_modes:
+        return f"Invalid apply_mode '{apply_mode}'"
+    available = lora_catalog.name_set()
+    if available is None:
+        available = frozenset(folder_paths.get_filename_list("loras"))
+    for input_name, lora_name in loras.items():
+        if not input_name.startswith("lora_") or lora_name is None or lora_name == "None" or lora_name in available:
+            continue
+        if folder_paths.get_full_path("loras", lora_name) is not None:
+            # Added since the last poll: accept it and let the watcher pick it up now
+            lora_catalog.refresh()
+            continue
+        return f"{input_name}: LoRA '{lora_name}' not found"
+    return True
@@ -0,0 +1,170 @@
+import threading
+from collections import OrderedDict
+
+import comfy.utils
+import torch
+
+from ..utils import env_int
+from .lora_cache import file_fingerprint, lora_cache
+from .lora_keymap import lora_key_maps
+from .lora_precision import dense
+
+try:
+    from comfy.weight_adapter import LoRAAdapter
+except ImportError:  # older ComfyUI patches with ("lora", weights) tuples
+    LoRAAdapter = None
+
+# Memory for fused LoRA stacks (each about the size of its LoRAs), overridable with OSHTZ_LORA_FUSED_MB
+DEFAULT_FUSED_BUDGET_MB = 2048
+
+
+def lora_factors(patch):
+    """Return (up, down, alpha) for a plain low-rank LoRA patch, or None for anything that can't be fused."""
+    if isinstance(patch, tuple) and len(patch) == 2 and patch[0] == "lora":
+        weights = patch[1]
+    elif getattr(patch, "name", None) == "lora" and hasattr(patch, "weights"):
+        weights = patch.weights  # comfy.weight_adapter.LoRAAdapter
+    else:
+        return None
+    up, down, alpha = weights[0], weights[1], weights[2]
+    mid = weights[3] if len(weights) > 3 else None
+    dora_scale = weights[4] if len(weights) > 4 else None
+    reshape = weights[5] if len(weights) > 5 else None
+    if mid is not None or dora_scale is not None or reshape is not None:
+        return None
+    return up, down, alpha
+
+
+def _weight_shape(model, clip, key):
+    for module in (getattr(model, "model", None), getattr(clip, "cond_stage_model", None)):
+        if module is None:
+            continue
+        try:
+            return comfy.utils.get_attr(module, key).shape
+        except AttributeError:
+            continue
+    return None
+
+
+def lora_patch(up, down):
+    """A plain LoRA patch (alpha folded into up) in the form the running ComfyUI expects."""
+    weights = (up, down, None, None, None, None)
+    if LoRAAdapter is not None:
+        return LoRAAdapter(set(), weights)
+    return ("lora", weights)
+
+
+def fuse_patch_sets(model, clip, patch_sets):
+    """
+    Fuse the low-rank factors of several resolved LoRA patch dicts into one LoRA per weight.
+
+    patch_sets is a list of (patches, strength). Returns (fused, passthrough):
+    fused maps each weight key to a single "lora" patch of rank r1 + ... + rN whose
+    factors are concatenated, up = [s1 * a1 * U1 | s2 * a2 * U2 | ...] and
+    down = [D1; D2; ...], so up @ down is the same sum as applying each LoRA on
+    its own while costing no more memory than the LoRAs themselves.
+    passthrough lists the (patches, strength) that aren't plain LoRA (LoHa, LoKr, DoRA, ...)
+    and still have to be applied individually.
+    """
+    factors_by_key = {}
+    passthrough = []
+    for patches, strength in patch_sets:
+        rest = {}
+        for key, patch in patches.items():
+            factors = lora_factors(patch) if isinstance(key, str) else None
+            if factors is None or _weight_shape(model, clip, key) is None:
+                rest[key] = patch
+                continue
+            up, down, alpha = factors
+            up, down = dense(up), dense(down)
+            scale = strength * (float(alpha) / down.shape[0] if alpha is not None else 1.0)
+            factors_by_key.setdefault(key, []).append(((up.float() * scale).to(up.dtype), down))
+        if rest:
+            passthrough.append((rest, strength))
+    fused = {}
+    for key, parts in factors_by_key.items():
+        dtype = parts[0][0].dtype
+        ups, downs = [up.to(dtype) for up, _ in parts], [down.to(dtype) for _, down in parts]
+        if len({up.shape[2:] for up in ups}) > 1 or len({down.shape[1:] for down in downs}) > 1:
+            # Mixed conv kernel layouts; the patch code flattens both factors anyway
+            ups, downs = [up.flatten(start_dim=1) for up in ups], [down.flatten(start_dim=1) for down in downs]
+        fused[key] = lora_patch(torch.cat(ups, dim=1), torch.cat(downs, dim=0))
+    return fused, passthrough
+
+
+def fused_nbytes(fused):
+    """Bytes owned by a fused stack: its concatenated factors (passthrough patches belong to lora_cache)."""
+    fused_patches, _ = fused
+    return sum(sum(t.nbytes for t in lora_factors(patch)[:2]) for patch in fused_patches.values())
+
+
+class FusedStackCache:
+    """
+    LRU of fused LoRA stacks, keyed by architecture plus each LoRA's fingerprint and strength.
+
+    Bounded by the bytes of the factors it holds; a stack over the whole
+    budget is not cached.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes_used = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        nbytes = fused_nbytes(value)
+        with self._lock:
+            if key in self._entries or nbytes > self.budget_bytes:
+                return
+            while self._entries and self.bytes_used + nbytes > self.budget_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes_used -= evicted
+            self._entries[key] = (value, nbytes)
+            self.bytes_used += nbytes
+
+
+fused_stacks = FusedStackCache(env_int("OSHTZ_LORA_FUSED_MB", DEFAULT_FUSED_BUDGET_MB) * 1024 * 1024)
+
+
+def fused_stack(model, clip, entries):
+    """The cached (fused, passthrough) patches of a stack of (lora_path, strength) entries, fusing it on a miss."""
+    arch, _ = lora_key_maps.key_map(model, clip)
+    stack_key = arch + tuple((file_fingerprint(path), strength) for path, strength in entries)
+    fused = fused_stacks.get(stack_key)
+    if fused is None:
+        patch_sets = [
+            (lora_key_maps.resolve_patches(model, clip, lora_cache.get(path)), strength)
+            for path, strength in entries
+        ]
+        fused = fuse_patch_sets(model, clip, patch_sets)
+        fused_stacks.put(stack_key, fused)
+    return fused
+
+
+def load_lora_stack(model, clip, entries):
+    """
+    Apply several LoRAs at once. entries is a list of (lora_path, strength).
+
+    The stack is fused into a single LoRA patch per weight, computed once and
+    cached, so applying N LoRAs costs one patch per weight instead of N.
+    """
+    fused_patches, passthrough = fused_stack(model, clip, entries)
+
+    new_model = model.clone() if model is not None else None
+    new_clip = clip.clone() if clip is not None else None
+    for patcher in (new_model, new_clip):
+        if patcher is None:
+            continue
+        patcher.add_patches(fused_patches, 1.0)
+        for patches, strength in passthrough:
+            patcher.add_patches(patches, strength)
+    return (new_model, new_clip)
@@ -0,0 +1,134 @@
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+import comfy.lora
+
+from .lora_precision import bind_int8_patches, expand_state_dict
+
+try:
+    from comfy.lora_convert import convert_lora
+except ImportError:  # older ComfyUI without LoRA format conversion
+    def convert_lora(sd):
+        return sd
+
+# Resolved (architecture, LoRA key set) matches kept in memory
+MAX_MATCH_ENTRIES = 64
+
+
+class LoraKeyMapCache:
+    """
+    Caches the LoRA-key -> model/CLIP state-dict key mapping per model architecture.
+
+    Building the key map walks every weight of the UNet and text encoders and
+    matching a LoRA against it tries each alias in every supported naming
+    scheme. Neither depends on the LoRA tensors, so both are resolved once per
+    (architecture fingerprint, LoRA key-set hash) and later switches only do
+    tensor work.
+    """
+
+    def __init__(self, max_match_entries):
+        self.max_match_entries = max_match_entries
+        self._arch = weakref.WeakKeyDictionary()  # module -> architecture fingerprint
+        self._key_maps = {}  # (model arch, clip arch) -> full key map
+        self._matches = OrderedDict()  # (model arch, clip arch, LoRA key-set hash) -> matched subset of the key map
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def arch_fingerprint(self, module):
+        """Hash of a module's type and state-dict key names/shapes, memoized per module object."""
+        if module is None:
+            return None
+        with self._lock:
+            fingerprint = self._arch.get(module)
+        if fingerprint is None:
+            digest = hashlib.sha1(type(module).__qualname__.encode())
+            for key, tensor in module.state_dict(keep_vars=True).items():
+                digest.update(f"{key}:{tuple(tensor.shape)};".encode())
+            fingerprint = digest.hexdigest()
+            with self._lock:
+                self._arch[module] = fingerprint
+        return fingerprint
+
+    def key_map(self, model, clip):
+        arch = (
+            self.arch_fingerprint(model.model) if model is not None else None,
+            self.arch_fingerprint(clip.cond_stage_model) if clip is not None else None,
+        )
+        with self._lock:
+            key_map = self._key_maps.get(arch)
+        if key_map is None:
+            key_map = {}
+            if model is not None:
+                key_map = comfy.lora.model_lora_keys_unet(model.model, key_map)
+            if clip is not None:
+                key_map = comfy.lora.model_lora_keys_clip(clip.cond_stage_model, key_map)
+            with self._lock:
+                self._key_maps[arch] = key_map
+        return arch, key_map
+
+    def resolve_patches(self, model, clip, lora):
+        """Equivalent of the key mapping and comfy.lora.load_lora steps of comfy.sd.load_lora_for_models."""
+        arch, key_map = self.key_map(model, clip)
+        try:
+            lora = convert_lora(lora)
+        except (AttributeError, TypeError):
+            lora = convert_lora(expand_state_dict(lora))  # a format conversion that needs plain tensors
+        match_key = arch + (len(lora), hash(frozenset(lora.keys())))
+        with self._lock:
+            matched = self._matches.get(match_key)
+            if matched is not None:
+                self._matches.move_to_end(match_key)
+                self.hits += 1
+        if matched is not None:
+            return bind_int8_patches(comfy.lora.load_lora(lora, matched))
+
+        loaded = comfy.lora.load_lora(lora, key_map)
+        # Only the aliases that resolved to a patched weight matter for this key set
+        matched = {alias: target for alias, target in key_map.items() if target in loaded}
+        with self._lock:
+            self.misses += 1
+            self._matches[match_key] = matched
+            while len(self._matches) > self.max_match_entries:
+                self._matches.popitem(last=False)
+        return bind_int8_patches(loaded)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "architectures": len(self._key_maps),
+                "matches": len(self._matches),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+lora_key_maps = LoraKeyMapCache(MAX_MATCH_ENTRIES)
+
+
+def load_lora_for_models(model, clip, lora, strength_model, strength_clip):
+    """comfy.sd.load_lora_for_models with the key mapping served from lora_key_maps."""
+    loaded = lora_key_maps.resolve_patches(model, clip, lora)
+    if model is not None:
+        new_modelpatcher = model.clone()
+        k = new_modelpatcher.add_patches(loaded, strength_model)
+    else:
+        k = ()
+        new_modelpatcher = None
+
+    if clip is not None:
+        new_clip = clip.clone()
+        k1 = new_clip.add_patches(loaded, strength_clip)
+    else:
+        k1 = ()
+        new_clip = None
+
+    k = set(k)
+    k1 = set(k1)
+    for x in loaded:
+        if (x not in k) and (x not in k1):
+            print(f"[oshtz-nodes] LoRA key not loaded: {x}")
+
+    return (new_modelpatcher, new_clip)
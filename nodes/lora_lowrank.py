@@ -0,0 +1,166 @@
+import comfy.utils
+import torch
+import torch.nn.functional as F
+
+try:
+    from comfy.patcher_extension import WrappersMP
+except ImportError:  # ComfyUI without model wrappers
+    WrappersMP = None
+
+from .lora_cache import lora_cache, load_lora, resolve_lora_path
+from .lora_fuse import fused_stack, load_lora_stack, lora_factors
+from .lora_keymap import lora_key_maps
+
+WRAPPER_KEY = "oshtz_lowrank_lora"
+APPLY_MODES = ["merged", "low_rank"]
+
+
+class LowRankLayer:
+    """Low-rank factors of one LoRA-patched Linear/Conv2d."""
+
+    def __init__(self, up, down, scale):
+        self.up = up
+        self.down = down
+        self.scale = scale
+
+    def factors(self, device, dtype):
+        # Cast per call: the factors are rank-sized, and keeping device copies would hold VRAM
+        # that ComfyUI's model management can't see or free when the model is unloaded
+        return self.up.to(device=device, dtype=dtype), self.down.to(device=device, dtype=dtype)
+
+    def delta(self, module, x):
+        up, down = self.factors(x.device, x.dtype)
+        if isinstance(module, torch.nn.Conv2d):
+            hidden = F.conv2d(x, down, None, module.stride, module.padding, module.dilation)
+            return F.conv2d(hidden, up)
+        return F.linear(F.linear(x, down), up)
+
+
+def _supports_low_rank(module, up, down):
+    if isinstance(module, torch.nn.Linear):
+        return up.ndim == 2 and down.ndim == 2
+    if isinstance(module, torch.nn.Conv2d):
+        return module.groups == 1 and up.ndim == 4 and down.ndim == 4 and tuple(up.shape[2:]) == (1, 1)
+    return False
+
+
+class LowRankLora:
+    """
+    DIFFUSION_MODEL wrapper that applies a LoRA without merging it into the weights.
+
+    For the duration of each diffusion model call it hooks every patched layer
+    and adds strength * scale * up(down(x)) to its output, so the base weights
+    are never rewritten and no full-size delta is materialized. Changing the
+    LoRA or strength only means building a new wrapper on a new clone.
+    """
+
+    def __init__(self, layers, strength):
+        self.layers = layers  # module path under diffusion_model -> LowRankLayer
+        self.strength = strength
+
+    def __call__(self, executor, *args, **kwargs):
+        root = executor.class_obj
+        handles = []
+        try:
+            for path, layer in self.layers.items():
+                module = comfy.utils.get_attr(root, path)
+                handles.append(module.register_forward_hook(self._hook(layer)))
+            return executor(*args, **kwargs)
+        finally:
+            for handle in handles:
+                handle.remove()
+
+    def _hook(self, layer):
+        strength = self.strength * layer.scale
+
+        def hook(module, args, output):
+            return output + strength * layer.delta(module, args[0])
+        return hook
+
+
+def split_low_rank(model, patches):
+    """Split resolved LoRA patches into low-rank layers for the diffusion model and patches to merge as usual."""
+    layers, rest = {}, {}
+    diffusion_model = model.model.diffusion_model
+    for key, patch in patches.items():
+        factors = lora_factors(patch)
+        if (factors is None or not isinstance(key, str)
+                or not key.startswith("diffusion_model.") or not key.endswith(".weight")):
+            rest[key] = patch
+            continue
+        up, down, alpha = factors
+        path = key[len("diffusion_model."):-len(".weight")]
+        try:
+            module = comfy.utils.get_attr(diffusion_model, path)
+        except AttributeError:
+            rest[key] = patch
+            continue
+        if not _supports_low_rank(module, up, down):
+            rest[key] = patch
+            continue
+        scale = float(alpha) / down.shape[0] if alpha is not None else 1.0
+        layers[path] = LowRankLayer(up, down, scale)
+    return layers, rest
+
+
+def load_lora_low_rank(model, clip, lora_name, strength_model, strength_clip):
+    """Like load_lora, but applies the model side as forward-time low-rank hooks instead of merged weights."""
+    if model is None or WrappersMP is None or not hasattr(model, "add_wrapper_with_key"):
+        print("[oshtz-nodes] Low-rank LoRA mode needs ComfyUI model wrappers, applying merged instead")
+        return load_lora(model, clip, lora_name, strength_model, strength_clip)
+    if strength_model == 0 and strength_clip == 0:
+        return (model, clip)
+
+    lora_path = resolve_lora_path(lora_name)
+    if lora_path is None:
+        raise FileNotFoundError(f"LoRA file not found: {lora_name}")
+    loaded = lora_key_maps.resolve_patches(model, clip, lora_cache.get(lora_path))
+
+    layers, rest = split_low_rank(model, loaded)
+    new_model = model.clone()
+    new_model.add_patches(rest, strength_model)
+    if layers and strength_model != 0:
+        new_model.add_wrapper_with_key(WrappersMP.DIFFUSION_MODEL, WRAPPER_KEY, LowRankLora(layers, strength_model))
+
+    new_clip = None
+    if clip is not None:
+        new_clip = clip.clone()
+        new_clip.add_patches(loaded, strength_clip)
+    return (new_model, new_clip)
+
+
+def load_lora_stack_low_rank(model, clip, entries):
+    """Like load_lora_stack, but applies the fused stack to the diffusion model as forward-time low-rank hooks."""
+    if model is None or WrappersMP is None or not hasattr(model, "add_wrapper_with_key"):
+        print("[oshtz-nodes] Low-rank LoRA mode needs ComfyUI model wrappers, applying merged instead")
+        return load_lora_stack(model, clip, entries)
+    fused_patches, passthrough = fused_stack(model, clip, entries)
+
+    # Strengths are already folded into the fused factors
+    layers, rest = split_low_rank(model, fused_patches)
+    new_model = model.clone()
+    new_model.add_patches(rest, 1.0)
+    for patches, strength in passthrough:
+        new_model.add_patches(patches, strength)
+    if layers:
+        new_model.add_wrapper_with_key(WrappersMP.DIFFUSION_MODEL, WRAPPER_KEY, LowRankLora(layers, 1.0))
+
+    new_clip = None
+    if clip is not None:
+        new_clip = clip.clone()
+        new_clip.add_patches(fused_patches, 1.0)
+        for patches, strength in passthrough:
+            new_clip.add_patches(patches, strength)
+    return (new_model, new_clip)
+
+
+def load_lora_stack_with_mode(apply_mode, model, clip, entries):
+    if apply_mode == "low_rank":
+        return load_lora_stack_low_rank(model, clip, entries)
+    return load_lora_stack(model, clip, entries)
+
+
+def load_lora_with_mode(apply_mode, model, clip, lora_name, strength_model, strength_clip):
+    if apply_mode == "low_rank":
+        return load_lora_low_rank(model, clip, lora_name, strength_model, strength_clip)
+    return load_lora(model, clip, lora_name, strength_model, strength_clip)
@@ -0,0 +1,89 @@
+import json
+import mmap
+import struct
+
+import comfy.utils
+import torch
+
+from ..utils import env_int
+
+# Memory-map .safetensors LoRAs instead of reading them into fresh tensors, disable with OSHTZ_LORA_MMAP=0
+MMAP_ENABLED = env_int("OSHTZ_LORA_MMAP", 1) != 0
+
+# Refuse absurd header lengths instead of trying to read them (safetensors caps headers at 100MB)
+MAX_HEADER_BYTES = 100 * 1024 * 1024
+
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+if hasattr(torch, "float8_e4m3fn"):
+    SAFETENSORS_DTYPES["F8_E4M3"] = torch.float8_e4m3fn
+    SAFETENSORS_DTYPES["F8_E5M2"] = torch.float8_e5m2
+
+
+def read_safetensors_header(path):
+    """Return (header dict, byte offset of the tensor data) for a .safetensors file."""
+    with open(path, "rb") as f:
+        prefix = f.read(8)
+        if len(prefix) != 8:
+            raise ValueError(f"Not a safetensors file: {path}")
+        header_len = struct.unpack("<Q", prefix)[0]
+        if header_len > MAX_HEADER_BYTES:
+            raise ValueError(f"Safetensors header too large ({header_len} bytes): {path}")
+        header = json.loads(f.read(header_len))
+    return header, 8 + header_len
+
+
+def load_safetensors_mmap(path):
+    """
+    Load a .safetensors file as tensors viewing a private memory map of the file.
+
+    Nothing is copied up front: pages are read from the OS page cache the first
+    time a tensor is touched, so only the weights that actually get patched
+    into the model are ever read or copied, and processes mapping the same
+    file share its pages.
+    """
+    header, data_start = read_safetensors_header(path)
+    with open(path, "rb") as f:
+        # ACCESS_COPY gives a writable copy-on-write view, which torch.frombuffer needs
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    state_dict = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = SAFETENSORS_DTYPES.get(info["dtype"])
+        if dtype is None:
+            raise ValueError(f"Unsupported safetensors dtype {info['dtype']} for '{name}' in {path}")
+        begin, end = info["data_offsets"]
+        offset = data_start + begin
+        itemsize = torch.empty((), dtype=dtype).element_size()
+        count = (end - begin) // itemsize
+        if count == 0:
+            tensor = torch.empty(0, dtype=dtype)
+        elif offset % itemsize:
+            # Misaligned data can't be viewed safely, copy this one tensor instead
+            tensor = torch.frombuffer(bytearray(mapped[offset:data_start + end]), dtype=dtype)
+        else:
+            tensor = torch.frombuffer(mapped, dtype=dtype, count=count, offset=offset)
+        state_dict[name] = tensor.reshape(info["shape"])
+    return state_dict
+
+
+def load_lora_file(path):
+    """Load a LoRA state dict, memory-mapping .safetensors files when enabled."""
+    if MMAP_ENABLED and path.lower().endswith(".safetensors"):
+        try:
+            return load_safetensors_mmap(path)
+        except Exception as e:
+            print(f"[oshtz-nodes] mmap load failed for '{path}', falling back to a regular read: {e}")
+    return comfy.utils.load_torch_file(path, safe_load=True)
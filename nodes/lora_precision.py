@@ -0,0 +1,124 @@
+import os
+
+import torch
+
+try:
+    from comfy.weight_adapter import LoRAAdapter
+except ImportError:  # older ComfyUI patches with plain tuples
+    LoRAAdapter = None
+
+# Storage precision of cached LoRA tensors, set with OSHTZ_LORA_CACHE_DTYPE: native (default), fp16, bf16 or int8
+STORAGE_DTYPES = {
+    "native": None,
+    "fp16": torch.float16,
+    "bf16": torch.bfloat16,
+    "int8": torch.int8,
+}
+# int8 weights are expanded to this dtype when patched
+INT8_COMPUTE_DTYPE = torch.float16
+
+
+def storage_dtype_from_env():
+    name = os.environ.get("OSHTZ_LORA_CACHE_DTYPE", "native").strip().lower() or "native"
+    if name not in STORAGE_DTYPES:
+        print(f"[oshtz-nodes] Invalid OSHTZ_LORA_CACHE_DTYPE={name!r}, expected one of {', '.join(STORAGE_DTYPES)}; using native")
+        return "native"
+    return name
+
+
+class Int8Tensor:
+    """A tensor quantized to int8 with one symmetric scale per output channel (dim 0)."""
+
+    def __init__(self, tensor):
+        flat = tensor.detach().float().flatten(start_dim=1)
+        self.shape = tensor.shape
+        self.dtype = tensor.dtype
+        self.scale = (flat.abs().amax(dim=1) / 127.0).clamp_(min=1e-12)
+        self.data = torch.round(flat / self.scale[:, None]).clamp_(-127, 127).to(torch.int8)
+
+    @property
+    def nbytes(self):
+        return self.data.numel() + self.scale.numel() * self.scale.element_size()
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+    def dequantize(self, device=None):
+        """The tensor in its compute dtype; with device, only the int8 data is moved and it is expanded there."""
+        dtype = self.dtype if self.dtype in (torch.float16, torch.bfloat16) else INT8_COMPUTE_DTYPE
+        data, scale = self.data.to(device), self.scale.to(device)
+        return (data.float() * scale[:, None]).reshape(self.shape).to(dtype)
+
+    def to(self, device=None, dtype=None):
+        tensor = self.dequantize(device)
+        return tensor.to(dtype) if dtype is not None else tensor
+
+
+def dense(tensor):
+    """tensor as a plain torch tensor, dequantizing an Int8Tensor."""
+    return tensor.dequantize() if isinstance(tensor, Int8Tensor) else tensor
+
+
+def _compactable(tensor):
+    # Only weight matrices/kernels; alphas, DoRA scales and other small vectors stay exact
+    return isinstance(tensor, torch.Tensor) and tensor.is_floating_point() and tensor.ndim >= 2
+
+
+def compact_state_dict(state_dict, storage):
+    """Return state_dict with its LoRA weights stored in the given precision (fp16/bf16 never upcast)."""
+    target = STORAGE_DTYPES.get(storage)
+    if target is None:
+        return state_dict
+    compact = {}
+    for key, tensor in state_dict.items():
+        if not _compactable(tensor):
+            compact[key] = tensor
+        elif target is torch.int8:
+            compact[key] = Int8Tensor(tensor)
+        elif tensor.element_size() > torch.finfo(target).bits // 8:
+            compact[key] = tensor.to(target)
+        else:
+            compact[key] = tensor
+    return compact
+
+
+def expand_state_dict(state_dict):
+    """Undo int8 quantization of a whole state dict, for code that has to see plain tensors."""
+    if not any(isinstance(tensor, Int8Tensor) for tensor in state_dict.values()):
+        return state_dict
+    return {key: dense(tensor) for key, tensor in state_dict.items()}
+
+
+if LoRAAdapter is not None:
+    class Int8LoRAAdapter(LoRAAdapter):
+        """LoRA patch holding int8 factors, expanded on the weight's device only while that weight is patched."""
+
+        def calculate_weight(self, weight, *args, **kwargs):
+            weights = tuple(t.dequantize(weight.device) if isinstance(t, Int8Tensor) else t for t in self.weights)
+            return LoRAAdapter(self.loaded_keys, weights).calculate_weight(weight, *args, **kwargs)
+else:
+    Int8LoRAAdapter = None
+
+
+def bind_int8_patches(patches):
+    """
+    Make resolved patches that reference Int8Tensor weights safe for ComfyUI's patch code.
+
+    Plain LoRAs become Int8LoRAAdapter, so the cache's int8 tensors are shared
+    by every patched clone and only one weight's factors are expanded at a
+    time. Other patch types (LoHa, LoKr, diff, or any patch on a ComfyUI
+    without weight adapters) get their int8 tensors expanded now.
+    """
+    bound = {}
+    for key, patch in patches.items():
+        weights = patch[1] if isinstance(patch, tuple) else getattr(patch, "weights", None)
+        if not isinstance(weights, (tuple, list)) or not any(isinstance(t, Int8Tensor) for t in weights):
+            bound[key] = patch
+        elif Int8LoRAAdapter is not None and type(patch) is LoRAAdapter:
+            bound[key] = Int8LoRAAdapter(patch.loaded_keys, patch.weights)
+        elif isinstance(patch, tuple):
+            bound[key] = (patch[0], tuple(dense(t) for t in weights))
+        else:
+            bound[key] = type(patch)(patch.loaded_keys, tuple(dense(t) for t in weights))
+    return bound
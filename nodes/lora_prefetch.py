@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ..utils import env_int
+from .lora_cache import lora_cache, resolve_lora_path
+
+# Concurrent disk reads, overridable with OSHTZ_LORA_PREFETCH_WORKERS
+DEFAULT_PREFETCH_WORKERS = 2
+# Prefetching stops once the LoRA cache holds this much, overridable with OSHTZ_LORA_PREFETCH_MB
+DEFAULT_PREFETCH_CEILING_MB = 2048
+
+# Node types whose hidden lora_config lists every LoRA a workflow may select
+PREFETCH_NODE_TYPES = ("LoraSwitcherDynamic", "LoraSwitcherSweep")
+
+
+def lora_names_from_config(lora_config):
+    """Extract the LoRA names listed in a LoraSwitcherDynamic lora_config (JSON string or parsed list)."""
+    if isinstance(lora_config, str):
+        try:
+            lora_config = json.loads(lora_config)
+        except json.JSONDecodeError:
+            return []
+    if not isinstance(lora_config, list):
+        return []
+    names = []
+    for config in lora_config:
+        if isinstance(config, dict):
+            name = config.get("lora")
+            if name and name != "None" and name not in names:
+                names.append(name)
+    return names
+
+
+class LoraPrefetcher:
+    """
+    Warms LoRA files into the shared LoRA cache on a small background thread pool,
+    so the switcher finds the selected LoRA already in RAM when it executes.
+    """
+
+    def __init__(self, max_workers, ceiling_bytes):
+        self.ceiling_bytes = ceiling_bytes
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="oshtz-lora-prefetch")
+        # Planning (path lookups, stat) gets its own thread so it never waits behind queued file reads
+        self._planner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="oshtz-lora-prefetch-plan")
+        self._pending = {}  # lora_path -> file size reserved against the ceiling
+        self._reserved_bytes = 0
+        self._lock = threading.Lock()
+        self.prefetched = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def prefetch(self, lora_names):
+        """Queue lora_names for background loading. Returns the number of files queued."""
+        queued = 0
+        for lora_name in lora_names:
+            lora_path = resolve_lora_path(lora_name)
+            if lora_path is None:
+                continue
+            try:
+                if lora_cache.contains(lora_path):
+                    continue
+                size = os.path.getsize(lora_path)
+            except OSError:
+                continue
+            with self._lock:
+                if lora_path in self._pending:
+                    continue
+                # Queued and in-flight loads count too, or a long list would all pass against an empty cache
+                if lora_cache.bytes_used + self._reserved_bytes + size > min(self.ceiling_bytes, lora_cache.budget_bytes):
+                    self.skipped += 1
+                    continue
+                self._pending[lora_path] = size
+                self._reserved_bytes += size
+            self._executor.submit(self._load, lora_path)
+            queued += 1
+        return queued
+
+    def prefetch_config(self, lora_config):
+        return self.prefetch(lora_names_from_config(lora_config))
+
+    def schedule_config(self, lora_config):
+        """prefetch_config on the planning thread, keeping path lookups and stat() off the server event loop."""
+        return self._planner.submit(self.prefetch_config, lora_config)
+
+    def schedule_prompt(self, prompt):
+        """prefetch_prompt on the planning thread, see schedule_config."""
+        return self._planner.submit(self.prefetch_prompt, prompt)
+
+    def prefetch_prompt(self, prompt):
+        """Queue every LoRA listed by the switcher nodes of an API-format prompt."""
+        queued = 0
+        for node in (prompt or {}).values():
+            if isinstance(node, dict) and node.get("class_type") in PREFETCH_NODE_TYPES:
+                queued += self.prefetch_config(node.get("inputs", {}).get("lora_config"))
+        return queued
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "reserved_bytes": self._reserved_bytes,
+                "prefetched": self.prefetched,
+                "skipped": self.skipped,
+                "failed": self.failed,
+                "ceiling_bytes": self.ceiling_bytes,
+            }
+
+    def _load(self, lora_path):
+        try:
+            lora_cache.get(lora_path)
+            with self._lock:
+                self.prefetched += 1
+        except Exception as e:
+            print(f"[oshtz-nodes] Failed to prefetch LoRA '{lora_path}': {e}")
+            with self._lock:
+                self.failed += 1
+        finally:
+            with self._lock:
+                self._reserved_bytes -= self._pending.pop(lora_path, 0)
+
+
+lora_prefetcher = LoraPrefetcher(
+    env_int("OSHTZ_LORA_PREFETCH_WORKERS", DEFAULT_PREFETCH_WORKERS),
+    env_int("OSHTZ_LORA_PREFETCH_MB", DEFAULT_PREFETCH_CEILING_MB) * 1024 * 1024,
+)
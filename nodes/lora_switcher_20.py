@@ -1,5 +1,6 @@
-from nodes import LoraLoader
-import folder_paths
+from .lora_cache import lora_change_key
+from .lora_catalog import lora_combo_input, validate_lora_selection
+from .lora_lowrank import APPLY_MODES, load_lora_with_mode
 
 class LoRASwitcherNode20:
     TITLE = "LoRA Switcher 20"
@@ -9,7 +10,7 @@ class LoRASwitcherNode20:
 
     @classmethod
     def INPUT_TYPES(cls):
-        lora_list = ["None"] + folder_paths.get_filename_list("loras")
+        lora_input = lora_combo_input()
         return {
             "required": {
                 "model": ("MODEL",),
@@ -21,30 +22,28 @@ class LoRASwitcherNode20:
                     "step": 0.01
                 }),
                 "selected": (["None"] + [f"LoRA {i}" for i in range(1, 21)],),
-                "lora_1": (lora_list,),
-                "lora_2": (lora_list,),
-                "lora_3": (lora_list,),
-                "lora_4": (lora_list,),
-                "lora_5": (lora_list,),
-                "lora_6": (lora_list,),
-                "lora_7": (lora_list,),
-                "lora_8": (lora_list,),
-                "lora_9": (lora_list,),
-                "lora_10": (lora_list,),
-                "lora_11": (lora_list,),
-                "lora_12": (lora_list,),
-                "lora_13": (lora_list,),
-                "lora_14": (lora_list,),
-                "lora_15": (lora_list,),
-                "lora_16": (lora_list,),
-                "lora_17": (lora_list,),
-                "lora_18": (lora_list,),
-                "lora_19": (lora_list,),
-                "lora_20": (lora_list,),
+                **{f"lora_{i}": lora_input for i in range(1, 21)}
+            },
+            "optional": {
+                # low_rank adds the LoRA at forward time instead of merging it into the weights
+                "apply_mode": (APPLY_MODES, {"default": "merged"}),
             }
         }
 
-    def apply_lora(self, model, clip, lora_strength, selected, lora_1, lora_2, lora_3, lora_4, lora_5, lora_6, lora_7, lora_8, lora_9, lora_10, lora_11, lora_12, lora_13, lora_14, lora_15, lora_16, lora_17, lora_18, lora_19, lora_20):
+    @classmethod
+    def VALIDATE_INPUTS(cls, lora_strength=1.0, selected="None", apply_mode="merged", **loras):
+        return validate_lora_selection(20, lora_strength, selected, loras, apply_mode, APPLY_MODES)
+
+    @classmethod
+    def IS_CHANGED(cls, lora_strength=1.0, selected="None", **loras):
+        # Re-run when the selected LoRA file changes on disk, not just when inputs change
+        if not isinstance(selected, str):
+            # Linked selection, unknown until execution: key on the raw inputs
+            return repr((lora_strength, selected, sorted(loras.items(), key=lambda item: item[0])))
+        lora_name = loras.get("lora_" + selected.split(" ")[-1]) if selected != "None" else None
+        return lora_change_key(lora_name, lora_strength, lora_strength)
+
+    def apply_lora(self, model, clip, lora_strength, selected, lora_1, lora_2, lora_3, lora_4, lora_5, lora_6, lora_7, lora_8, lora_9, lora_10, lora_11, lora_12, lora_13, lora_14, lora_15, lora_16, lora_17, lora_18, lora_19, lora_20, apply_mode="merged"):
         if selected == "None" or lora_strength == 0:
             return (model, clip)
 
@@ -60,8 +59,8 @@ class LoRASwitcherNode20:
             return (model, clip)
 
         # Apply the selected LoRA
-        model, clip = LoraLoader().load_lora(
-            model, clip, lora_name, lora_strength, lora_strength
+        model, clip = load_lora_with_mode(
+            apply_mode, model, clip, lora_name, lora_strength, lora_strength
         )
 
         return (model, clip)
\ No newline at end of file
@@ -1,9 +1,14 @@
 import folder_paths
-from nodes import LoraLoader
+from .lora_cache import file_fingerprint, lora_cache, lora_change_key, patched_variants, resolve_lora_path
+from .lora_prefetch import lora_prefetcher
+from .lora_catalog import get_lora_names, lora_catalog
+from .lora_keymap import lora_key_maps
+from .lora_lowrank import APPLY_MODES, load_lora_stack_with_mode, load_lora_with_mode
 from ..utils import FlexibleOptionalInputType, any_type
 import server # Import the server instance
 from aiohttp import web # For JSON response
 import json # Import json for parsing
+import asyncio
 
 class LoraSwitcherDynamic:
     """
@@ -30,11 +35,25 @@ class LoraSwitcherDynamic:
             # nodes like Power Lora Loader handles adding widgets for
             # lora_name, strength_model, strength_clip.
             # "optional": FlexibleOptionalInputType(any_type),
-            # Optional is no longer needed as data comes via hidden input
+            # low_rank adds the selected LoRA at forward time instead of merging it into the weights
+            "optional": {"apply_mode": (APPLY_MODES, {"default": "merged"})},
             "hidden": {"lora_config": "STRING", "prompt": "PROMPT", "extra_pnginfo": "EXTRA_PNGINFO"}, # Add hidden input for config
         }
 
-    def apply_lora(self, model, clip, active_index, lora_config=None, **kwargs):
+    @classmethod
+    def VALIDATE_INPUTS(cls, apply_mode="merged"):
+        # Workflows saved before apply_mode existed can hand it a stale widget value; apply_lora treats that as merged
+        return True
+
+    @classmethod
+    def IS_CHANGED(cls, active_index=0, lora_config=None, **kwargs):
+        # Fingerprint only what affects the output: the applied entries and their files on disk
+        selection = _selected_loras(active_index, lora_config)
+        if not selection:
+            return "bypass"
+        return ";".join(lora_change_key(lora_name, strength, strength) for lora_name, strength in selection)
+
+    def apply_lora(self, model, clip, active_index, lora_config=None, apply_mode="merged", **kwargs):
         # --- Enhanced DEBUG logging --- 
         # print(f"\n{'='*80}")
         # print(f"{self.TITLE}: EXECUTION START")
@@ -103,6 +122,13 @@ class LoraSwitcherDynamic:
             # print(f"{self.TITLE}: active_index {active_index} resolves to negative target index {target_index}")
             # print(f"{self.TITLE}: EXECUTION END - Negative target index\n")
             return (model, clip)
+
+        # Entries flagged "stack" are applied together with the selected one
+        stack_indices = {i for i, config in enumerate(lora_configs) if config.get('stack')}
+        if stack_indices:
+            if target_index < len(lora_configs):
+                stack_indices.add(target_index)
+            return self.apply_stack(model, clip, [lora_configs[i] for i in sorted(stack_indices)], apply_mode)
             
         if target_index >= len(lora_configs):
             # print(f"{self.TITLE}: active_index {active_index} (target: {target_index}) is out of range for the {len(lora_configs)} available LoRA(s).")
@@ -153,8 +179,12 @@ class LoraSwitcherDynamic:
                  # print(f"{self.TITLE}: Found LoRA at path: {lora_path}")
                  pass
 
-            # print(f"{self.TITLE}: Calling LoraLoader().load_lora...")
-            model_lora, clip_lora = LoraLoader().load_lora(model, clip, lora_name, strength_model, strength_clip)
+            # Reuse the already-patched clone when this selection was applied to the same base before
+            variant_key = (file_fingerprint(lora_path), strength_model, strength_clip, apply_mode)
+            model_lora, clip_lora = patched_variants.get_or_create(
+                model, clip, variant_key,
+                lambda: load_lora_with_mode(apply_mode, model, clip, lora_name, strength_model, strength_clip),
+            )
             # print(f"{self.TITLE}: LoRA application successful!")
             # print(f"{self.TITLE}: EXECUTION END - Success\n")
             return (model_lora, clip_lora)
@@ -166,20 +196,169 @@ class LoraSwitcherDynamic:
             # Fallback to returning original model/clip on error
             return (model, clip)
 
+    def apply_stack(self, model, clip, stack_configs, apply_mode="merged"):
+        """Apply several lora_config entries at once as one fused LoRA patch per weight."""
+        entries = []
+        for config in stack_configs:
+            lora_name = config.get('lora', 'None')
+            strength = config.get('strength', 0.0)
+            if lora_name == "None" or lora_name is None or strength == 0:
+                continue
+            lora_path = resolve_lora_path(lora_name)
+            if lora_path is None:
+                print(f"{self.TITLE}: ERROR: LoRA file not found: {lora_name}")
+                continue
+            entries.append((lora_name, lora_path, float(strength)))
+
+        if not entries:
+            return (model, clip)
+        try:
+            if len(entries) == 1:
+                lora_name, lora_path, strength = entries[0]
+                variant_key = (file_fingerprint(lora_path), strength, strength, apply_mode)
+                create = lambda: load_lora_with_mode(apply_mode, model, clip, lora_name, strength, strength)
+            else:
+                variant_key = ("stack", apply_mode) + tuple((file_fingerprint(path), strength) for _, path, strength in entries)
+                create = lambda: load_lora_stack_with_mode(apply_mode, model, clip, [(path, strength) for _, path, strength in entries])
+            return patched_variants.get_or_create(model, clip, variant_key, create)
+        except Exception as e:
+            print(f"{self.TITLE}: Failed to apply LoRA stack {[name for name, _, _ in entries]}. Error: {e}")
+            import traceback
+            print(f"{self.TITLE}: Traceback: {traceback.format_exc()}")
+            return (model, clip)
+
+
+def _selected_loras(active_index, lora_config):
+    """Return the (lora_name, strength) entries apply_lora would use, or [] when bypassed."""
+    try:
+        target_index = int(active_index) - 1
+        configs = json.loads(lora_config) if lora_config else []
+    except (ValueError, TypeError):
+        return []
+    if target_index < 0 or not isinstance(configs, list):
+        return []
+    configs = [c for c in configs if isinstance(c, dict) and 'lora' in c and 'strength' in c]
+    indices = {i for i, c in enumerate(configs) if c.get('stack')}
+    if target_index < len(configs):
+        indices.add(target_index)
+    return [(configs[i].get('lora', 'None'), configs[i].get('strength', 0.0)) for i in sorted(indices)]
+
 
 # --- Add Custom API Endpoint ---
 @server.PromptServer.instance.routes.get("/oshtz-nodes/get-loras")
 async def get_loras_endpoint(request):
-    """Custom API endpoint to fetch the LoRA list."""
+    """
+    Custom API endpoint to fetch the LoRA list.
+
+    Without query parameters this returns the flat name list the frontend uses,
+    with an ETag so unchanged lists can be answered with 304. since=<version>
+    returns only the names added and removed since that catalog version.
+    With q (substring of name, trigger words or base model), prefix, offset,
+    limit or details it returns a page of catalog entries with their metadata.
+    Pass refresh=1 to trigger an immediate rescan of the LoRA folders.
+    """
     try:
-        lora_list = ["None"] + folder_paths.get_filename_list("loras")
-        # print("[LoraSwitcherDynamic] Served LoRA list via custom endpoint.") # Add log
-        return web.json_response(lora_list)
+        query = request.rel_url.query
+        if query.get("refresh"):
+            lora_catalog.refresh()
+        if "since" in query:
+            return _compressed(web.json_response(_lora_list_delta(int(query["since"]))))
+        if not any(k in query for k in ("q", "prefix", "offset", "limit", "details")):
+            version, names = lora_catalog.snapshot()
+            if names is None:
+                return _compressed(web.json_response(["None"] + get_lora_names()))
+            etag = f'"oshtz-loras-{version}"'
+            if etag in [tag.strip().removeprefix("W/") for tag in request.headers.get("If-None-Match", "").split(",")]:
+                return web.Response(status=304, headers={"ETag": etag})
+            lora_list = ["None"] + names
+            # print("[LoraSwitcherDynamic] Served LoRA list via custom endpoint.") # Add log
+            return _compressed(web.json_response(lora_list, headers={
+                "ETag": etag,
+                "Cache-Control": "no-cache",
+                "X-Oshtz-Lora-Version": str(version),
+            }))
+
+        offset = max(0, int(query.get("offset", 0)))
+        limit = min(1000, max(1, int(query.get("limit", 100))))
+        total, items = await asyncio.to_thread(
+            lora_catalog.search, query.get("q", ""), query.get("prefix", ""), offset, limit
+        )
+        return _compressed(web.json_response({"total": total, "offset": offset, "limit": limit, "items": items}))
+    except ValueError as e:
+        return web.json_response({"error": f"Invalid query parameter: {e}"}, status=400)
     except Exception as e:
         print(f"Error in /oshtz-nodes/get-loras endpoint: {e}")
         return web.json_response(["None", f"ERROR: {e}"], status=500)
 
 
+def _compressed(response):
+    # Negotiates gzip/deflate from the request's Accept-Encoding header
+    response.enable_compression()
+    return response
+
+
+def _lora_list_delta(since):
+    delta = lora_catalog.changes_since(since)
+    if delta is None:
+        version, names = lora_catalog.snapshot()
+        return {"version": version, "full": ["None"] + (names if names is not None else get_lora_names())}
+    version, added, removed = delta
+    return {"version": version, "added": added, "removed": removed}
+
+
+def _broadcast_lora_changes(version, previous_version, added, removed):
+    """Push LoRA list changes to every open frontend so it never has to poll."""
+    server.PromptServer.instance.send_sync("oshtz-nodes.loras-changed", {
+        "version": version,
+        "previous_version": previous_version,
+        "added": added,
+        "removed": removed,
+    })
+
+
+@server.PromptServer.instance.routes.get("/oshtz-nodes/lora-cache-stats")
+async def lora_cache_stats_endpoint(request):
+    """Report hit/miss/eviction counters of the shared LoRA cache."""
+    return web.json_response({
+        **lora_cache.stats(),
+        "variants": patched_variants.stats(),
+        "prefetch": lora_prefetcher.stats(),
+        "key_maps": lora_key_maps.stats(),
+    })
+
+
+@server.PromptServer.instance.routes.post("/oshtz-nodes/prefetch-loras")
+async def prefetch_loras_endpoint(request):
+    """Warm the LoRAs listed in a lora_config into the LoRA cache in the background."""
+    try:
+        lora_config = await request.json()
+        queued = await asyncio.wrap_future(lora_prefetcher.schedule_config(lora_config))
+        return web.json_response({"queued": queued})
+    except Exception as e:
+        print(f"Error in /oshtz-nodes/prefetch-loras endpoint: {e}")
+        return web.json_response({"queued": 0, "error": str(e)}, status=400)
+
+
+def _prefetch_on_prompt(json_data):
+    """Start loading every LoRA a queued prompt may select before the executor reaches it."""
+    # Resolving paths and stat()ing files happens on the prefetcher's planning thread, not on the event loop
+    future = lora_prefetcher.schedule_prompt(json_data.get("prompt"))
+    future.add_done_callback(_report_prefetch_failure)
+    return json_data
+
+
+def _report_prefetch_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        print(f"[oshtz-nodes] LoRA prefetch on prompt failed: {future.exception()}")
+
+
+server.PromptServer.instance.add_on_prompt_handler(_prefetch_on_prompt)
+
+# Index the LoRA folders in the background so the first list request doesn't walk them
+lora_catalog.add_listener(_broadcast_lora_changes)
+lora_catalog.start()
+
+
 # --- Serve static files for oshtz-nodes ---
 import os as _os
 
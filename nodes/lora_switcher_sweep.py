@@ -0,0 +1,138 @@
+import json
+
+from .lora_cache import file_fingerprint, lora_change_key, patched_variants, resolve_lora_path
+from .lora_lowrank import APPLY_MODES, load_lora_with_mode
+from .lora_prefetch import lora_prefetcher
+
+
+# Highest row a range may name, so a typo like "1-1000000000" is rejected instead of expanded
+MAX_INDEX = 1024
+
+
+def parse_indices(text, limit=MAX_INDEX):
+    """Parse "1, 3, 5-7" into [1, 3, 5, 6, 7]; ranges stop at row limit."""
+    indices = []
+    for part in str(text).replace(",", " ").split():
+        start, sep, end = part.partition("-")
+        if sep:
+            start, end = int(start), int(end)
+            if end < start:
+                raise ValueError(f"range '{part}' is reversed")
+            if end > MAX_INDEX:
+                raise ValueError(f"range '{part}' goes past row {MAX_INDEX}")
+            indices.extend(range(start, min(end, limit) + 1))
+        else:
+            indices.append(int(part))
+    return indices
+
+
+def parse_strengths(text):
+    """Parse "0.25, 0.5 1" into [0.25, 0.5, 1.0]; empty means each row's own strength."""
+    return [float(part) for part in str(text).replace(",", " ").split()]
+
+
+def lora_entries(lora_config):
+    """The {'lora', 'strength'} rows of a dynamic-switcher lora_config."""
+    try:
+        configs = json.loads(lora_config) if lora_config else []
+    except json.JSONDecodeError:
+        return []
+    if not isinstance(configs, list):
+        return []
+    return [c for c in configs if isinstance(c, dict) and 'lora' in c and 'strength' in c]
+
+
+def sweep_plan(active_indices, strengths, lora_config):
+    """Return the (label, lora_name, strength) variants a sweep produces, lora_name None for the base model."""
+    entries = lora_entries(lora_config)
+    strength_list = parse_strengths(strengths)
+    plan = []
+    for index in parse_indices(active_indices, len(entries)):
+        if index <= 0 or index > len(entries) or entries[index - 1].get('lora', 'None') in ("None", None):
+            plan.append(("bypass", None, 0.0))
+            continue
+        lora_name = entries[index - 1]['lora']
+        for strength in strength_list or [float(entries[index - 1]['strength'])]:
+            plan.append((f"{index}: {lora_name} @ {strength:g}", lora_name, strength))
+    return plan
+
+
+class LoraSwitcherSweep:
+    """
+    Fans one LoRA list out into several patched MODEL/CLIP variants in a single run,
+    one per (active index, strength) pair, for grids and A/B comparisons.
+
+    Every variant is a clone of the same base patcher built from the shared LoRA
+    cache, so base weights and LoRA tensors are loaded once for the whole sweep.
+    """
+    CATEGORY = "oshtz Nodes"
+    TITLE = "LoRA Switcher Sweep"
+    RETURN_TYPES = ("MODEL", "CLIP", "STRING")
+    RETURN_NAMES = ("MODEL", "CLIP", "label")
+    OUTPUT_IS_LIST = (True, True, True)
+    FUNCTION = "sweep"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "model": ("MODEL",),
+                "clip": ("CLIP",),
+                # 1-based rows of the LoRA list, e.g. "1, 3, 5-7"; 0 emits the unpatched model
+                "active_indices": ("STRING", {"default": "1"}),
+                # e.g. "0.25, 0.5, 1.0"; empty uses each row's own strength
+                "strengths": ("STRING", {"default": ""}),
+            },
+            "optional": {"apply_mode": (APPLY_MODES, {"default": "merged"})},
+            "hidden": {"lora_config": "STRING"},
+        }
+
+    @classmethod
+    def VALIDATE_INPUTS(cls, active_indices="1", strengths="", apply_mode="merged"):
+        # Linked inputs arrive as None and are parsed when the node runs
+        if active_indices is not None:
+            try:
+                parse_indices(active_indices)
+            except ValueError as e:
+                return f"Invalid active_indices '{active_indices}' ({e}), expected e.g. '1, 3, 5-7'"
+        if strengths is not None:
+            try:
+                parse_strengths(strengths)
+            except ValueError:
+                return f"Invalid strengths '{strengths}', expected e.g. '0.25, 0.5, 1.0'"
+        if apply_mode is not None and apply_mode not in APPLY_MODES:
+            return f"Invalid apply_mode '{apply_mode}'"
+        return True
+
+    @classmethod
+    def IS_CHANGED(cls, active_indices="1", strengths="", lora_config=None, **kwargs):
+        try:
+            plan = sweep_plan(active_indices, strengths, lora_config)
+        except ValueError:
+            return ""
+        return ";".join(lora_change_key(lora_name, strength, strength) for _, lora_name, strength in plan)
+
+    def sweep(self, model, clip, active_indices, strengths, lora_config=None, apply_mode="merged"):
+        plan = sweep_plan(active_indices, strengths, lora_config)
+        # Start reading the later LoRAs while the first variants are patched
+        lora_prefetcher.prefetch({lora_name for _, lora_name, _ in plan if lora_name is not None})
+
+        models, clips, labels = [], [], []
+        for label, lora_name, strength in plan:
+            variant = (model, clip)
+            if lora_name is not None and strength != 0:
+                lora_path = resolve_lora_path(lora_name)
+                if lora_path is None:
+                    print(f"{self.TITLE}: ERROR: LoRA file not found: {lora_name}")
+                    continue
+                variant = patched_variants.get_or_create(
+                    model, clip, (file_fingerprint(lora_path), strength, strength, apply_mode),
+                    lambda: load_lora_with_mode(apply_mode, model, clip, lora_name, strength, strength),
+                )
+            models.append(variant[0])
+            clips.append(variant[1])
+            labels.append(label)
+
+        if not models:
+            return ([model], [clip], ["bypass"])
+        return (models, clips, labels)
@@ -0,0 +1,68 @@
+import concurrent.futures
+import threading
+
+from .async_transport import POLL_SECONDS, processing_interrupted, raise_if_interrupted
+
+# Every SingleFlight created, for the stats endpoint
+_groups = []
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls.
+
+    The first caller for a key runs the call; callers arriving with the same
+    key while it is in flight wait for that call and get its result (or its
+    exception) instead of paying for their own. Nothing is kept once the call
+    finishes, so this is not a cache.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.calls = 0
+        self.coalesced = 0
+        _groups.append(self)
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = concurrent.futures.Future()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            print(f"[oshtz-nodes] {self.name}: joining identical in-flight request {key[:12]}")
+            return self._wait(future)
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "saved_calls": self.coalesced, "in_flight": len(self._in_flight)}
+
+    @staticmethod
+    def _wait(future):
+        # Followers stay interruptible while the leader's request runs
+        while True:
+            try:
+                return future.result(timeout=POLL_SECONDS)
+            except concurrent.futures.TimeoutError:
+                if processing_interrupted():
+                    raise_if_interrupted()
+
+
+def single_flight_stats():
+    return {group.name: group.stats() for group in _groups}
@@ -3,6 +3,7 @@ from PIL import Image
 import base64
 import io
 import importlib.util
+import os
 import sys
 import numpy as np # Added numpy import
 
@@ -16,6 +17,14 @@ def ensure_package(package_name, version=None):
         import subprocess
         subprocess.check_call([sys.executable, "-m", "pip", "install", f"{package_name}{f'=={version}' if version else ''}"])
 
+def env_int(name, default):
+    """Read an integer setting from the environment, falling back to default when unset or invalid."""
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        print(f"[oshtz-nodes] Ignoring invalid {name}={os.environ.get(name)!r}, using {default}")
+        return default
+
 def tensor2pil(image: torch.Tensor) -> Image.Image:
     # Assuming input is BHWC (Batch, Height, Width, Channels)
     # Squeeze batch dim, move to CPU, convert to numpy
@@ -0,0 +1,47 @@
+import { app } from "../../../../scripts/app.js";
+import { api } from "../../../../scripts/api.js";
+import { ComfyWidgets } from "../../../../scripts/widgets.js";
+
+// Live preview of streamed LLM All-In-One responses, fed by "oshtz-nodes.llm-stream" server events
+const PREVIEW_WIDGET = "preview";
+
+function findNode(id) {
+    return app.graph?.getNodeById(id) ?? app.graph?.getNodeById(Number(id));
+}
+
+api.addEventListener("oshtz-nodes.llm-stream", ({ detail }) => {
+    const widget = findNode(detail.node)?.widgets?.find((w) => w.name === PREVIEW_WIDGET);
+    if (!widget) {
+        return;
+    }
+    if (detail.text !== undefined) {
+        widget.value = detail.text; // complete response (cached, coalesced or final)
+    } else {
+        widget.value = (detail.start ? "" : widget.value) + detail.delta;
+    }
+    if (widget.inputEl) {
+        widget.inputEl.scrollTop = widget.inputEl.scrollHeight;
+    }
+    app.graph.setDirtyCanvas(true, false);
+});
+
+app.registerExtension({
+    name: "oshtz.LLMStreamPreview",
+    async beforeRegisterNodeDef(nodeType, nodeData) {
+        if (nodeData.name !== "LLMAIONode") {
+            return;
+        }
+        const onNodeCreated = nodeType.prototype.onNodeCreated;
+        nodeType.prototype.onNodeCreated = function () {
+            const result = onNodeCreated?.apply(this, arguments);
+            // Created with the node so the widget order (and saved widget values) stay stable
+            const { widget } = ComfyWidgets["STRING"](this, PREVIEW_WIDGET, ["STRING", { multiline: true }], app);
+            widget.serializeValue = () => undefined; // display only, never sent with the prompt
+            if (widget.inputEl) {
+                widget.inputEl.readOnly = true;
+                widget.inputEl.placeholder = "Streamed response appears here";
+            }
+            return result;
+        };
+    },
+});
@@ -8,14 +8,50 @@ let OshtzApp = null;
 // Store fetched LoRA names
 let LORA_NAMES = ["None"];
 
-// Fetch LoRA names from the custom endpoint
-async function fetchLoraNames() {
+// Shared LoRA list state: one fetch per page, then kept current by server pushes instead of re-fetching
+const loraListState = {
+    loaded: false,
+    version: null, // catalog version LORA_NAMES corresponds to
+    etag: null,
+    inflight: null,
+};
+
+// Fetch LoRA names from the custom endpoint (served from the shared cache once loaded)
+async function fetchLoraNames({ force = false } = {}) {
+    if (loraListState.loaded && !force) {
+        return LORA_NAMES;
+    }
+    if (!loraListState.inflight) {
+        loraListState.inflight = loadLoraNames().finally(() => {
+            loraListState.inflight = null;
+        });
+    }
+    return loraListState.inflight;
+}
+
+async function loadLoraNames() {
     try {
-        const response = await api.fetchApi("/oshtz-nodes/get-loras");
-        if (response.ok) {
+        // Only ask for what changed when we already hold a versioned list
+        if (loraListState.version !== null) {
+            const response = await api.fetchApi(`/oshtz-nodes/get-loras?since=${loraListState.version}`);
+            if (response.ok) {
+                applyLoraListDelta(await response.json());
+                return LORA_NAMES;
+            }
+        }
+
+        const headers = loraListState.etag ? { "If-None-Match": loraListState.etag } : {};
+        const response = await api.fetchApi("/oshtz-nodes/get-loras", { headers });
+        if (response.status === 304) {
+            loraListState.loaded = true;
+        } else if (response.ok) {
             const data = await response.json();
             if (Array.isArray(data) && data.length > 0) {
                 LORA_NAMES = data;
+                const version = response.headers.get("X-Oshtz-Lora-Version");
+                loraListState.version = version !== null ? Number(version) : null;
+                loraListState.etag = response.headers.get("ETag");
+                loraListState.loaded = true;
             } else {
                 console.error("[LoraSwitcherDynamic] Fetched LoRA list is invalid:", data);
                 LORA_NAMES = ["None", "ERROR: Fetch Failed"];
@@ -31,6 +67,51 @@ async function fetchLoraNames() {
     return LORA_NAMES;
 }
 
+// Apply a {version, added, removed} delta (or a {version, full} reset) to the shared list
+function applyLoraListDelta(delta) {
+    if (Array.isArray(delta.full)) {
+        LORA_NAMES = delta.full;
+    } else {
+        const removed = new Set(delta.removed || []);
+        const names = new Set(LORA_NAMES.filter(name => name !== "None" && !removed.has(name)));
+        for (const name of delta.added || []) {
+            names.add(name);
+        }
+        LORA_NAMES = ["None", ...[...names].sort()];
+    }
+    loraListState.version = delta.version ?? null;
+    loraListState.etag = null;
+    loraListState.loaded = true;
+}
+
+// The server pushes LoRA folder changes; apply them in place or resync if we missed one
+api.addEventListener("oshtz-nodes.loras-changed", ({ detail }) => {
+    if (loraListState.loaded && loraListState.version !== null && detail.previous_version === loraListState.version) {
+        applyLoraListDelta(detail);
+    } else {
+        fetchLoraNames({ force: true });
+    }
+});
+api.addEventListener("reconnected", () => {
+    fetchLoraNames({ force: true });
+});
+
+// Ask the server to warm the configured LoRAs into its cache (debounced per node)
+const prefetchTimers = new Map();
+function schedulePrefetch(node, jsonConfig) {
+    clearTimeout(prefetchTimers.get(node.id));
+    prefetchTimers.set(node.id, setTimeout(() => {
+        prefetchTimers.delete(node.id);
+        api.fetchApi("/oshtz-nodes/prefetch-loras", {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: jsonConfig
+        }).catch(error => {
+            console.warn("[LoraSwitcherDynamic] LoRA prefetch request failed:", error);
+        });
+    }, 500));
+}
+
 // Helper to get the current LoRA config from custom widgets
 function getLoraConfigFromWidgets(node) {
     const config = [];
@@ -43,10 +124,15 @@ function getLoraConfigFromWidgets(node) {
 
     for (const widget of rowWidgets) {
         if (widget.value && typeof widget.value === 'object') {
-            config.push({
+            const entry = {
                 lora: widget.value.lora,
                 strength: widget.value.strength
-            });
+            };
+            // Stacked entries are applied together with the active one
+            if (widget.value.stack) {
+                entry.stack = true;
+            }
+            config.push(entry);
         }
     }
     return config;
@@ -150,6 +236,7 @@ function updateHiddenConfig(node) {
             hiddenWidget.draw = function() {}; // Empty draw function
         }
         
+        schedulePrefetch(node, jsonConfig);
         node.setDirtyCanvas(true, true);
     } catch (e) {
         console.error("[LoraSwitcherDynamic] Failed to update lora_config:", e);
@@ -200,8 +287,8 @@ function createLoraRowWidget(node, index, initialValue = { lora: "None", strengt
             const circleY = line_y;
             const circleRadius = Math.min(indexWidth, widgetHeight) * 0.4;
             
-            // Draw circle background for index
-            ctx.fillStyle = "#4488ff"; // Bright blue background for index
+            // Draw circle background for index (green when the row is stacked)
+            ctx.fillStyle = this.value.stack ? "#44bb66" : "#4488ff";
             ctx.beginPath();
             ctx.arc(circleX, circleY, circleRadius, 0, Math.PI * 2);
             ctx.fill();
@@ -283,7 +370,12 @@ function createLoraRowWidget(node, index, initialValue = { lora: "None", strengt
                     if (pos[0] >= area[0] && pos[0] <= area[0] + area[2] && // Check X
                         pos[1] >= widgetY && pos[1] <= widgetY + widgetHeight) { // Check Y relative to widget
 
-                        if (areaName === 'name') {
+                        if (areaName === 'index') {
+                            // Toggle stacking: stacked rows are applied together with the active one
+                            this.value.stack = !this.value.stack;
+                            updateHiddenConfig(node);
+                            node.setDirtyCanvas(true, true);
+                        } else if (areaName === 'name') {
                             // Fetch latest LoRA names first, then show menu
                             fetchLoraNames().then(loraNames => {
                                 // Format the names for the menu
@@ -384,7 +476,8 @@ app.registerExtension({
         this.lora_names = await fetchLoraNames().catch(() => ["None"]);
 
         // Check if the node type matches
-        if (nodeData.name === 'LoraSwitcherDynamic') {
+        // The sweep node shares the dynamic switcher's LoRA list widget
+        if (nodeData.name === 'LoraSwitcherDynamic' || nodeData.name === 'LoraSwitcherSweep') {
             // --- Modify onNodeCreated ---
             const onNodeCreated = nodeType.prototype.onNodeCreated;
             nodeType.prototype.onNodeCreated = function () {
@@ -445,6 +538,12 @@ app.registerExtension({
                       savedConfig = [];
                  }
 
+                 // Workflows saved before apply_mode existed shift their widget values onto it
+                 const modeWidget = this.widgets?.find(w => w.name === "apply_mode");
+                 if (modeWidget && !modeWidget.options?.values?.includes(modeWidget.value)) {
+                     modeWidget.value = "merged";
+                 }
+
                  // Re-add the standard widgets (button)
                  addStandardWidgets(this);
 
@@ -456,7 +555,8 @@ app.registerExtension({
                      const loraData = savedConfig[i];
                      const cleanData = {
                          lora: loraData.lora || "None",
-                         strength: typeof loraData.strength === 'number' ? loraData.strength : 1.0
+                         strength: typeof loraData.strength === 'number' ? loraData.strength : 1.0,
+                         stack: loraData.stack === true
                      };
                      
                      // Find existing widget with this index
@@ -524,6 +624,8 @@ app.registerExtension({
                      configWidget.draw = function() {}; // Empty draw function
                  }
 
+                 // Warm the saved LoRAs on the server so the first run doesn't wait on disk
+                 schedulePrefetch(this, jsonConfig);
 
                  // Optional: Refresh LoRA names list
                  fetchLoraNames().then(names => {